@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+That module provides asyncio versions of Spreadsheet and SpreadsheetManager classes. They have the same methods,
+but every method returns awaitable and runs in a thread pool, so many sheets can be processed at the same time.
+All requests are limited by request limiter of google_sheets module (see "set_request_limiter")
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from google_sheets.google_sheets import (Spreadsheet, SpreadsheetManager, set_request_limiter)
+
+
+# Google Sheets API allows 60 requests per minute per user by default
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_MINUTE = 60
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def configure(max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+              requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE):
+    """
+    It sets limits for all requests to Google API and size of the thread pool. It's called with default limits
+    on first use if it wasn't called before
+
+    :param max_concurrency: how many requests can be sent at the same time. Default is 8
+    :param requests_per_minute: how many requests can be sent per minute. Default is 60
+    """
+    global _executor
+
+    set_request_limiter(max_concurrency, requests_per_minute)
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = ThreadPoolExecutor(max_workers=max_concurrency or DEFAULT_MAX_CONCURRENCY,
+                                   thread_name_prefix='google-sheets')
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    if _executor is None:
+        configure()
+
+    return _executor
+
+
+class _AsyncWrapper:
+    """
+    It wraps instance, so its public methods and properties return awaitables and run in the shared thread pool
+    (properties like "sheet_list" can send requests too). Other attributes are returned as they are
+    """
+    def __init__(self, wrapped):
+        self._wrapped = wrapped
+
+    def __getattr__(self, name: str):
+        if not name.startswith('_') and isinstance(getattr(type(self._wrapped), name, None), property):
+            async def get_property():
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(_get_executor(), getattr, self._wrapped, name)
+
+            return get_property()
+
+        attribute = getattr(self._wrapped, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def method(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_get_executor(), functools.partial(attribute, *args, **kwargs))
+
+        return method
+
+
+class AsyncSpreadsheet(_AsyncWrapper):
+    """
+    Asyncio version of Spreadsheet class. Spreadsheet should be connected before wrapping, because connection
+    is checked on init:
+
+        spreadsheet = AsyncSpreadsheet(Spreadsheet(spreadsheet_id))
+        await spreadsheet.update_data(data, 'A1:B2')
+    """
+    def __init__(self, spreadsheet: Spreadsheet):
+        """
+        :param spreadsheet: instance of Spreadsheet class should be given. Otherwise, TypeError will be raised
+        """
+        if not isinstance(spreadsheet, Spreadsheet):
+            raise TypeError(f'expected {Spreadsheet}, but got {type(spreadsheet)}')
+
+        super().__init__(spreadsheet)
+        self.spreadsheet = spreadsheet
+
+
+class AsyncSpreadsheetManager(_AsyncWrapper):
+    """
+    Asyncio version of SpreadsheetManager class. For example, several csv files can be uploaded at the same time:
+
+        manager = AsyncSpreadsheetManager(SpreadsheetManager(spreadsheet))
+        await asyncio.gather(*[manager.upload_csv(file, sheet_name=name) for name, file in csv_files.items()])
+    """
+    def __init__(self, manager: SpreadsheetManager):
+        """
+        :param manager: instance of SpreadsheetManager class should be given. Otherwise, TypeError will be raised
+        """
+        if not isinstance(manager, SpreadsheetManager):
+            raise TypeError(f'expected {SpreadsheetManager}, but got {type(manager)}')
+
+        super().__init__(manager)
+        self.manager = manager
+        self.spreadsheet = AsyncSpreadsheet(manager.spreadsheet)
@@ -2,14 +2,15 @@
 """
 That module provides class and functions to work with Google Sheets API
 """
+import csv
+import json
 import os
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Iterator, Tuple, Union
 
-import apiclient
-import httplib2
-from oauth2client.service_account import ServiceAccountCredentials
-
-from utils import (CsvTools, logging)
+from google_sheets.ranges import (GridRange, qualify)
+from utils import (CsvTools, RateLimiter, logging)
 
 
 CREDENTIALS_FILE = os.path.dirname(__file__) + '/keys.json'
@@ -17,15 +18,126 @@ SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets',
     'https://www.googleapis.com/auth/drive'
 ]
+# Google API name and version of every service
+SERVICES = {
+    'sheets': ('sheets', 'v4'),
+    'drive': ('drive', 'v3')
+}
+
+# Credentials and services are created on first use and shared between all Spreadsheet instances
+_credentials = None
+_services = {}
+_services_lock = threading.Lock()
+_thread_local = threading.local()
+_request_limiter = None
+
+
+def _get_credentials():
+    """
+    :return: credentials from "keys.json" file. They are read only once
+    """
+    global _credentials
+
+    with _services_lock:
+        if _credentials is None:
+            from oauth2client.service_account import ServiceAccountCredentials
+
+            _credentials = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, SCOPES)
+
+    return _credentials
+
+
+def _get_service(name: str):
+    """
+    It builds Google API service on first use. Discovery documents shipped with google-api-python-client are used,
+    so no request is sent to build it
+
+    :param name: 'sheets' or 'drive'
+    :return: service instance
+    """
+    if name not in _services:
+        from apiclient import discovery
+        import httplib2
+
+        http = _get_credentials().authorize(httplib2.Http())
+        with _services_lock:
+            if name not in _services:
+                service_name, version = SERVICES[name]
+                _services[name] = discovery.build(service_name, version, http=http,
+                                                  cache_discovery=False, static_discovery=True)
+
+    return _services[name]
+
+
+def _sheets_service():
+    return _get_service('sheets')
+
+
+def _drive_service():
+    return _get_service('drive')
+
+
+class RequestLimiter:
+    """
+    Thread-safe limiter of requests to Google API: not more than "max_concurrency" requests at the same time and
+    not more than "requests_per_minute" requests per minute
+    """
+    def __init__(self, max_concurrency: int = None, requests_per_minute: float = None):
+        """
+        :param max_concurrency: how many requests can be sent at the same time. If None, it is not limited
+        :param requests_per_minute: how many requests can be sent per minute. If None, it is not limited
+        """
+        self._semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._rate_limiter = RateLimiter(requests_per_minute, period=60) if requests_per_minute else None
+
+    def __enter__(self):
+        if self._semaphore:
+            self._semaphore.acquire()
+        if self._rate_limiter:
+            self._rate_limiter.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._semaphore:
+            self._semaphore.release()
+
+
+def set_request_limiter(max_concurrency: int = None, requests_per_minute: float = None):
+    """
+    It limits all requests to Google API which are sent by that module from any thread. Call it without arguments
+    to remove limits
+
+    :param max_concurrency: how many requests can be sent at the same time. If None, it is not limited
+    :param requests_per_minute: how many requests can be sent per minute. If None, it is not limited
+    """
+    global _request_limiter
 
+    if max_concurrency or requests_per_minute:
+        _request_limiter = RequestLimiter(max_concurrency, requests_per_minute)
+    else:
+        _request_limiter = None
 
-credentials = ServiceAccountCredentials.from_json_keyfile_name(
-    CREDENTIALS_FILE,
-    SCOPES
-)
-httpAuth = credentials.authorize(httplib2.Http())
-sheets_service = apiclient.discovery.build('sheets', 'v4', http=httpAuth)
-drive_service = apiclient.discovery.build('drive', 'v3', http=httpAuth)
+
+def _execute(request):
+    """
+    It executes request of Google API client. httplib2.Http instance can't be shared between threads,
+    so every thread gets its own authorized one
+
+    :param request: request of Google API client
+    :return: response data
+    """
+    http = getattr(_thread_local, 'http', None)
+    if http is None:
+        import httplib2
+
+        http = _thread_local.http = _get_credentials().authorize(httplib2.Http())
+
+    limiter = _request_limiter
+    if limiter is None:
+        return request.execute(http=http)
+
+    with limiter:
+        return request.execute(http=http)
 
 
 class Spreadsheet:
@@ -35,13 +147,57 @@ class Spreadsheet:
         - Get, update, clear data of the spreadsheet
         - Add/delete sheets
     """
+    # Only these fields of spreadsheet metadata are requested to build sheet index
+    SHEET_FIELDS = 'sheets.properties'
+
     def __init__(self, spreadsheet_id=None):
+        # Sheet properties by sheet id and sheet ids by title. They are updated from responses of sheet changes,
+        # so sheet lookups don't send requests
+        self._sheets_by_id: Dict[int, dict] = {}
+        self._sheet_ids_by_title: Dict[str, int] = {}
+        self._sheet_index_loaded = False
+        # Sheets can be changed from several threads (see async_sheets), so new sheet ids are chosen and sheet index
+        # is changed only under that lock
+        self._sheet_lock = threading.RLock()
+
         if spreadsheet_id is None:
             self.spreadsheetId = None
         else:
             self.get_spreadsheet_by_id(spreadsheet_id)
 
-        self.sheet_list: List[dict] = []
+    @property
+    def sheet_list(self) -> List[dict]:
+        """
+        :return: list of sheets with their information like [{'properties': {'sheetId': 0, 'title': ...}}, ...]
+        """
+        with self._sheet_lock:
+            self._ensure_sheet_index()
+            return [{'properties': properties} for properties in self._sheets_by_id.values()]
+
+    def get_sheet_id(self, title: str) -> int:
+        """
+        :param title: title of the sheet
+        :return: id of the sheet. If there is no sheet with that title, KeyError will be raised
+        """
+        with self._sheet_lock:
+            self._ensure_sheet_index()
+            return self._sheet_ids_by_title[title]
+
+    def get_sheet_properties(self, sheet_id: int) -> dict:
+        """
+        :param sheet_id: id of the sheet
+        :return: properties of the sheet. If there is no sheet with that id, KeyError will be raised
+        """
+        with self._sheet_lock:
+            self._ensure_sheet_index()
+            return self._sheets_by_id[sheet_id]
+
+    def invalidate_sheet_index(self):
+        """
+        It marks sheet index as outdated, so it will be requested again on next lookup. Call it if sheets
+        were changed not with that instance
+        """
+        self._sheet_index_loaded = False
 
     def create_spreadsheet(self, sheets=None):
         """
@@ -52,12 +208,13 @@ class Spreadsheet:
         if sheets is None:
             sheets = [{'properties': {'sheetType': 'GRID', 'sheetId': 0}}]
 
-        spreadsheet = sheets_service.spreadsheets().create(body={
+        spreadsheet = _execute(_sheets_service().spreadsheets().create(body={
             'properties': {'title': 'just a document', 'locale': 'ru_RU'},
             'sheets': sheets
-        }).execute()
+        }))
 
         self.spreadsheetId = spreadsheet['spreadsheetId']
+        self._set_sheet_index(spreadsheet.get('sheets', []))
 
         print('Spreadsheet was created at https://docs.google.com/spreadsheets/d/' + self.spreadsheetId)
         return self
@@ -70,7 +227,7 @@ class Spreadsheet:
         """
         if spreadsheetId == self.spreadsheetId:
             try:
-                file = drive_service.files().delete(fileId=spreadsheetId).execute()
+                file = _execute(_drive_service().files().delete(fileId=spreadsheetId))
                 logging.info(file)
             except:
                 logging.error('Exception occurred!', exc_info=True)
@@ -117,11 +274,11 @@ class Spreadsheet:
         self.check_id_was_provided()
 
         try:
-            access = drive_service.permissions().create(
+            access = _execute(_drive_service().permissions().create(
                 fileId=self.spreadsheetId,
                 body={'type': 'user', 'role': role, 'emailAddress': email_address},
                 fields='id'
-            ).execute()
+            ))
         except:
             logging.error('Error occurred!', exc_info=True)
             raise Exception("Can't grant permission. See logs.txt for more information")
@@ -147,17 +304,16 @@ class Spreadsheet:
 
         self.check_id_was_provided()
 
-        if sheet_name:
-            range_name = f'{sheet_name}!{range_name}'
+        range_name = qualify(range_name, sheet_name)
 
         try:
-            result = sheets_service.spreadsheets().values().get(
+            result = _execute(_sheets_service().spreadsheets().values().get(
                 spreadsheetId=self.spreadsheetId,
                 majorDimension=dimension.upper(),
                 range=range_name,
                 valueRenderOption=value_render_option,
                 dateTimeRenderOption=date_time_render_option
-            ).execute()
+            ))
         except:
             logging.error('Error occurred', exc_info=True)
             raise Exception("Can't get data. See logs.txt for more information")
@@ -168,6 +324,41 @@ class Spreadsheet:
         print(f'{len(rows)} rows retrieved.')
         return rows
 
+    def batch_get_data(self, ranges: List[str], dimension: str = "ROWS", value_render_option: str = 'FORMATTED_VALUE',
+                       date_time_render_option: str = 'SERIAL_NUMBER') -> Dict[str, List[list]]:
+        """
+        It gets data of many ranges (they can be in different sheets) with one request
+
+        :param ranges: range names like "sheet_name!A1:B2"
+        :param dimension: can be 'ROWS' or 'COLUMNS' (see "get_data_by_range")
+        :param value_render_option:
+        :param date_time_render_option:
+
+        :return: dict of rows of data by range names as they were given
+        """
+        self.check_id_was_provided()
+
+        try:
+            result = _execute(_sheets_service().spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheetId,
+                majorDimension=dimension.upper(),
+                ranges=ranges,
+                valueRenderOption=value_render_option,
+                dateTimeRenderOption=date_time_render_option
+            ))
+        except:
+            logging.error('Error occurred', exc_info=True)
+            raise Exception("Can't get data. See logs.txt for more information")
+
+        # value ranges are returned in the same order as ranges were requested
+        data = {range_name: value_range.get('values', [])
+                for range_name, value_range in zip(ranges, result.get('valueRanges', []))}
+
+        rows_amount = sum(len(rows) for rows in data.values())
+        logging.info(f'{rows_amount} rows retrieved from {len(ranges)} ranges.')
+        print(f'{rows_amount} rows retrieved.')
+        return data
+
     def update_data(self, data: List[list], range_name: str, value_input_option: str = 'USER_ENTERED', sheet_name: str = None):
         """
         It updates data in certain range of cells in certain sheet
@@ -179,19 +370,18 @@ class Spreadsheet:
         """
         self.check_id_was_provided()
 
-        if sheet_name:
-            range_name += f'{sheet_name}!{range_name}'
+        range_name = qualify(range_name, sheet_name)
 
         values = data
         body = {
             'values': values
         }
         try:
-            result = sheets_service.spreadsheets().values().update(
+            result = _execute(_sheets_service().spreadsheets().values().update(
                 spreadsheetId=self.spreadsheetId,
                 range=range_name,
                 valueInputOption=value_input_option,
-                body=body).execute()
+                body=body))
         except:
             logging.error('Exception occurred', exc_info=True)
             raise Exception("Can't update data. See logs.txt ")
@@ -207,46 +397,85 @@ class Spreadsheet:
         :param range_name: can be like "A1:B2" or "sheet_name!A1:B2"
         """
 
-        if sheet_name:
-            range_name = f'{sheet_name}!{range_name}'
+        range_name = qualify(range_name, sheet_name)
 
         try:
-            request = sheets_service.spreadsheets().values().clear(
+            request = _sheets_service().spreadsheets().values().clear(
                 spreadsheetId=self.spreadsheetId,
                 range=range_name,
                 body={}
             )
-            response = request.execute()
+            response = _execute(request)
             logging.info(response)
         except:
             logging.error('Exception occurred', exc_info=True)
             raise Exception("Can't clear data. See logs.txt for more information")
 
-    def add_sheet(self, title=None):
+    def batch_update_data(self, data: Dict[str, List[list]], value_input_option: str = 'USER_ENTERED'):
         """
-        It creates a new sheet.
+        It updates data in many ranges (they can be in different sheets) with one request
 
-        # :param title: if it's not provided, sheet title would be generated automatically
+        :param data: dict of data to load by range name. Range name should be like "sheet_name!A1:B2"
+        :param value_input_option: can be 'USER_ENTERED' or 'RAW' (see "update_data")
         """
-        self.update_sheet_list()
+        self.check_id_was_provided()
 
-        if title is None:
-            title = "Sheet" + str(len(self.sheet_list) + 1)
+        body = {
+            'valueInputOption': value_input_option,
+            'data': [{'range': range_name, 'values': values} for range_name, values in data.items()]
+        }
+        try:
+            result = _execute(_sheets_service().spreadsheets().values().batchUpdate(
+                spreadsheetId=self.spreadsheetId,
+                body=body))
+        except:
+            logging.error('Exception occurred', exc_info=True)
+            raise Exception("Can't update data. See logs.txt for more information")
 
-        body = {'requests': [
-                {"addSheet": {"properties": {'sheetId': len(self.sheet_list), 'title': title}}}]}
+        logging.info(f'{result.get("totalUpdatedCells")} cells updated in {len(data)} ranges.')
+        print(f'{result.get("totalUpdatedCells")} cells updated.')
+
+    def batch_clear_data(self, ranges: List[str]):
+        """
+        It clears data in many ranges (they can be in different sheets) with one request
+
+        :param ranges: range names like "sheet_name!A1:B2"
+        """
+        self.check_id_was_provided()
 
         try:
-            sheet = sheets_service.spreadsheets().batchUpdate(
+            response = _execute(_sheets_service().spreadsheets().values().batchClear(
                 spreadsheetId=self.spreadsheetId,
-                body=body
-            ).execute()
+                body={'ranges': ranges}
+            ))
+            logging.info(response)
         except:
             logging.error('Exception occurred', exc_info=True)
-            raise Exception("Can't create a sheet. See logs.txt for more details")
+            raise Exception("Can't clear data. See logs.txt for more information")
+
+    def add_sheet(self, title=None):
+        """
+        It creates a new sheet.
+
+        # :param title: if it's not provided, sheet title would be generated automatically
+        """
+        with self._sheet_lock:
+            self._ensure_sheet_index()
+
+            if title is None:
+                title = "Sheet" + str(len(self._sheets_by_id) + 1)
+
+            sheet_id = max(self._sheets_by_id, default=-1) + 1
+            requests = [{"addSheet": {"properties": {'sheetId': sheet_id, 'title': title}}}]
+
+            try:
+                sheet = self._batch_update(requests)
+            except:
+                logging.error('Exception occurred', exc_info=True)
+                raise Exception("Can't create a sheet. See logs.txt for more details")
 
         logging.info(sheet)
-        self.update_sheet_list()
+        return sheet_id
 
     def delete_sheet(self, sheet_id: int):
         """
@@ -254,36 +483,212 @@ class Spreadsheet:
 
         :param sheet_id: id of concrete sheet
         """
-        self.update_sheet_list()
+        with self._sheet_lock:
+            self._ensure_sheet_index()
 
-        for sheet in self.sheet_list:
-            if sheet['properties']['sheetId'] == sheet_id:
-                break
-        else:
-            raise ValueError('There is no sheet with that id')
+            if sheet_id not in self._sheets_by_id:
+                raise ValueError('There is no sheet with that id')
+
+            requests = [{"deleteSheet":  {'sheetId': sheet_id}}]
+
+            try:
+                sheet = self._batch_update(requests)
+            except:
+                logging.error('Exception occurred', exc_info=True)
+                raise Exception("Can't delete a sheet. See logs.txt for more details")
+
+        logging.info(sheet)
+
+    def add_sheets(self, titles: List[str]) -> List[int]:
+        """
+        It creates many sheets with one request. Sheets which already exist are kept as they are
+
+        :param titles: titles of sheets
+        :return: ids of sheets in the same order as titles were given
+        """
+        with self._sheet_lock:
+            self._ensure_sheet_index()
+
+            requests = []
+            next_sheet_id = max(self._sheets_by_id, default=-1) + 1
+            for title in dict.fromkeys(titles):
+                if title in self._sheet_ids_by_title:
+                    continue
+
+                requests += [{"addSheet": {"properties": {'sheetId': next_sheet_id, 'title': title}}}]
+                next_sheet_id += 1
+
+            if requests:
+                try:
+                    response = self._batch_update(requests)
+                except:
+                    logging.error('Exception occurred', exc_info=True)
+                    raise Exception("Can't create sheets. See logs.txt for more details")
+
+                logging.info(response)
 
-        body = {'requests': [
-            {"deleteSheet":  {'sheetId': sheet_id}}]}
+            return [self._sheet_ids_by_title[title] for title in titles]
+
+    def delete_sheets(self, sheets: List[Union[int, str]], ignore_missing=False):
+        """
+        It deletes many sheets with one request
+
+        :param sheets: ids or titles of sheets
+        :param ignore_missing: if True, sheets which don't exist are skipped. Otherwise, ValueError will be raised.
+        Default is False
+        """
+        with self._sheet_lock:
+            sheet_ids = self._get_sheet_ids(sheets, ignore_missing)
+            if not sheet_ids:
+                return
+
+            try:
+                response = self._batch_update([{"deleteSheet": {'sheetId': sheet_id}} for sheet_id in sheet_ids])
+            except:
+                logging.error('Exception occurred', exc_info=True)
+                raise Exception("Can't delete sheets. See logs.txt for more details")
+
+        logging.info(response)
+
+    def clear_sheets(self, sheets: List[Union[int, str]], ignore_missing=False):
+        """
+        It clears all values of many sheets with one request. Formatting of cells is kept
+
+        :param sheets: ids or titles of sheets
+        :param ignore_missing: if True, sheets which don't exist are skipped. Otherwise, ValueError will be raised.
+        Default is False
+        """
+        sheet_ids = self._get_sheet_ids(sheets, ignore_missing)
+        if not sheet_ids:
+            return
 
         try:
-            sheet = sheets_service.spreadsheets().batchUpdate(
-                spreadsheetId=self.spreadsheetId,
-                body=body
-            ).execute()
+            response = self._batch_update([self._get_clear_request(sheet_id) for sheet_id in sheet_ids])
         except:
             logging.error('Exception occurred', exc_info=True)
-            raise Exception("Can't delete a sheet. See logs.txt for more details")
+            raise Exception("Can't clear sheets. See logs.txt for more details")
 
-        logging.info(sheet)
-        self.update_sheet_list()
+        logging.info(response)
+
+    def prepare_sheets(self, titles: List[str]) -> List[int]:
+        """
+        It makes every sheet empty with one request: existing sheets are cleared and missing ones are created
+
+        :param titles: titles of sheets
+        :return: ids of sheets in the same order as titles were given
+        """
+        with self._sheet_lock:
+            self._ensure_sheet_index()
+
+            requests = []
+            next_sheet_id = max(self._sheets_by_id, default=-1) + 1
+            for title in dict.fromkeys(titles):
+                if title in self._sheet_ids_by_title:
+                    requests += [self._get_clear_request(self._sheet_ids_by_title[title])]
+                else:
+                    requests += [{"addSheet": {"properties": {'sheetId': next_sheet_id, 'title': title}}}]
+                    next_sheet_id += 1
+
+            if requests:
+                try:
+                    response = self._batch_update(requests)
+                except:
+                    logging.error('Exception occurred', exc_info=True)
+                    raise Exception("Can't prepare sheets. See logs.txt for more details")
+
+                logging.info(response)
+
+            return [self._sheet_ids_by_title[title] for title in titles]
+
+    def _get_sheet_ids(self, sheets: List[Union[int, str]], ignore_missing: bool) -> List[int]:
+        """
+        :param sheets: ids or titles of sheets
+        :param ignore_missing: if True, sheets which don't exist are skipped. Otherwise, ValueError will be raised
+        :return: ids of existing sheets without duplicates
+        """
+        self._ensure_sheet_index()
+
+        sheet_ids = []
+        for sheet in sheets:
+            sheet_id = self._sheet_ids_by_title.get(sheet) if isinstance(sheet, str) else sheet
+            if sheet_id not in self._sheets_by_id:
+                if ignore_missing:
+                    continue
+                raise ValueError(f'There is no sheet {sheet}')
+
+            if sheet_id not in sheet_ids:
+                sheet_ids += [sheet_id]
+
+        return sheet_ids
+
+    @staticmethod
+    def _get_clear_request(sheet_id: int) -> dict:
+        """
+        :param sheet_id: id of the sheet
+        :return: request which clears all values of the sheet
+        """
+        return {"updateCells": {'range': {'sheetId': sheet_id}, 'fields': 'userEnteredValue'}}
 
     def update_sheet_list(self):
         """
         It updates list of sheets with their information
         """
-        spreadsheet = sheets_service.spreadsheets().get(spreadsheetId=self.spreadsheetId).execute()
-        sheet_list = spreadsheet.get('sheets')
-        self.sheet_list = sheet_list
+        with self._sheet_lock:
+            spreadsheet = _execute(_sheets_service().spreadsheets().get(spreadsheetId=self.spreadsheetId,
+                                                                        fields=self.SHEET_FIELDS))
+            self._set_sheet_index(spreadsheet.get('sheets', []))
+
+    def _ensure_sheet_index(self):
+        """
+        It requests sheet index if it wasn't requested yet or was invalidated
+        """
+        with self._sheet_lock:
+            if not self._sheet_index_loaded:
+                self.update_sheet_list()
+
+    def _set_sheet_index(self, sheet_list: List[dict]):
+        """
+        :param sheet_list: list of sheets from spreadsheet metadata
+        """
+        with self._sheet_lock:
+            self._sheets_by_id = {}
+            self._sheet_ids_by_title = {}
+            for sheet in sheet_list:
+                self._add_to_sheet_index(sheet['properties'])
+
+            self._sheet_index_loaded = True
+
+    def _add_to_sheet_index(self, properties: dict):
+        self._sheets_by_id[properties['sheetId']] = properties
+        self._sheet_ids_by_title[properties['title']] = properties['sheetId']
+
+    def _remove_from_sheet_index(self, sheet_id: int):
+        properties = self._sheets_by_id.pop(sheet_id, None)
+        if properties is not None:
+            self._sheet_ids_by_title.pop(properties['title'], None)
+
+    def _batch_update(self, requests: List[dict]) -> dict:
+        """
+        It sends requests to change spreadsheet with one "batchUpdate" call and updates sheet index from its replies
+
+        :param requests: list of requests like [{"addSheet": {...}}, {"deleteSheet": {...}}]
+        :return: response data
+        """
+        self.check_id_was_provided()
+
+        response = _execute(_sheets_service().spreadsheets().batchUpdate(
+            spreadsheetId=self.spreadsheetId,
+            body={'requests': requests}
+        ))
+
+        with self._sheet_lock:
+            for request, reply in zip(requests, response.get('replies', [])):
+                if 'addSheet' in request:
+                    self._add_to_sheet_index(reply['addSheet']['properties'])
+                elif 'deleteSheet' in request:
+                    self._remove_from_sheet_index(request['deleteSheet']['sheetId'])
+
+        return response
 
     def check_id_was_provided(self):
         """
@@ -308,10 +713,11 @@ class Spreadsheet:
         :return: True if can connect to Spreadsheet. Otherwise it returns False
         """
         try:
-            spreadsheet = sheets_service.spreadsheets().get(spreadsheetId=self.spreadsheetId).execute()
+            spreadsheet = _execute(_sheets_service().spreadsheets().get(spreadsheetId=self.spreadsheetId,
+                                                                        fields=self.SHEET_FIELDS))
             sheet_list = spreadsheet.get('sheets')
             sheet_id_test = sheet_list[0]['properties']['sheetId']
-            self.sheet_list = sheet_list
+            self._set_sheet_index(sheet_list)
             return True
         except KeyError:
             logging.error('Invalid url')
@@ -321,6 +727,83 @@ class Spreadsheet:
             return False
 
 
+class BatchWriter:
+    """
+    That class collects many updates and clears of ranges (they can be in different sheets) and sends them with as few
+    requests as possible. Can be used as context manager, then all collected changes are sent on exit.
+    All clears are sent before updates
+    """
+    # Google recommends to keep request payload not bigger than 2 MB
+    MAX_PAYLOAD_BYTES = 2 * 1024 * 1024
+
+    def __init__(self, spreadsheet: Spreadsheet, value_input_option: str = 'USER_ENTERED',
+                 max_payload_bytes: int = MAX_PAYLOAD_BYTES):
+        """
+        :param spreadsheet: Spreadsheet instance to send changes to
+        :param value_input_option: can be 'USER_ENTERED' or 'RAW' (see "Spreadsheet.update_data")
+        :param max_payload_bytes: max size of one request. Default is 2 MB
+        """
+        self.spreadsheet = spreadsheet
+        self.value_input_option = value_input_option
+        self.max_payload_bytes = max_payload_bytes
+        self._updates: Dict[str, List[list]] = {}
+        self._clears: List[str] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+
+    def update(self, data: List[list], range_name: str, sheet_name: str = None):
+        """
+        It adds update of range to the queue
+
+        :param data: data to load. Should be like list of lists, row by row
+        :param range_name: can be like "A1:B2" or "sheet_name!A1:B2"
+        :param sheet_name: name of sheet
+        """
+        range_name = qualify(range_name, sheet_name)
+
+        self._updates[range_name] = data
+
+    def clear(self, range_name: str, sheet_name: str = None):
+        """
+        It adds clear of range to the queue
+
+        :param range_name: can be like "A1:B2" or "sheet_name!A1:B2"
+        :param sheet_name: name of sheet
+        """
+        range_name = qualify(range_name, sheet_name)
+
+        self._clears += [range_name]
+
+    def flush(self):
+        """
+        It sends all collected changes. Updates are split into several requests if they are bigger than
+        "max_payload_bytes"
+        """
+        if self._clears:
+            self.spreadsheet.batch_clear_data(self._clears)
+            self._clears = []
+
+        batch, batch_size = {}, 0
+        for range_name, data in self._updates.items():
+            size = len(json.dumps({'range': range_name, 'values': data}, ensure_ascii=False).encode('utf-8'))
+            if batch and batch_size + size > self.max_payload_bytes:
+                self.spreadsheet.batch_update_data(batch, value_input_option=self.value_input_option)
+                batch, batch_size = {}, 0
+
+            batch[range_name] = data
+            batch_size += size
+
+        if batch:
+            self.spreadsheet.batch_update_data(batch, value_input_option=self.value_input_option)
+
+        self._updates = {}
+
+
 class SpreadsheetManager:
     """
     That class provides with easy-to-use functions
@@ -356,18 +839,398 @@ class SpreadsheetManager:
 
         range_name = self._get_range(left_corner_cell, rows_amount, col_amount)
 
-        if sheet_name:
-            range_name = f'{sheet_name}!{range_name}'
+        range_name = qualify(range_name, sheet_name)
 
         self.spreadsheet.update_data(rows, range_name)
 
         return range_name
 
+    def upload_csv_files(self, csv_files: Dict[str, str], left_corner_cell='A1', clear_range: str = None) -> List[str]:
+        """
+        It uploads many csv files to different sheets with as few requests as possible. Sheets should already exist
+
+        :param csv_files: dict of relative or absolute paths to csv files by sheet names
+        :param left_corner_cell: cell name to start creating the tables in sheets
+        :param clear_range: if provided, that range of every sheet is cleared before upload. Default is None
+
+        :return: updated ranges
+        """
+        updated_ranges = []
+        with BatchWriter(self.spreadsheet) as writer:
+            for sheet_name, csv_file in csv_files.items():
+                if clear_range:
+                    writer.clear(clear_range, sheet_name=sheet_name)
+
+                rows = CsvTools.csv_read_rows(csv_file)
+                range_name = self._get_range(left_corner_cell, len(rows), len(rows[0]))
+                writer.update(rows, range_name, sheet_name=sheet_name)
+                updated_ranges += [qualify(range_name, sheet_name)]
+
+        return updated_ranges
+
+    def upload_csv_chunked(self, csv_file: str, left_corner_cell='A1', sheet_name=None,
+                           chunk_bytes: int = BatchWriter.MAX_PAYLOAD_BYTES, max_workers: int = 1,
+                           resume=False) -> str:
+        """
+        It uploads big csv file by chunks of rows. File is read lazily, so only a few chunks are kept in memory.
+        Every chunk is written to its own range right under the previous one. Amount of uploaded rows is saved
+        to "{csv_file}.checkpoint" file with the target spreadsheet, sheet and cell, so upload can be continued
+        after a failure. Checkpoint of upload to other target is ignored
+
+        :param csv_file: relative or absolute path to csv file
+        :param left_corner_cell: cell name to start creating the table in sheet
+        :param sheet_name: name of sheet to upload csv to. If sheet doesn't exist it will raise error. Default is None
+        :param chunk_bytes: approximate max size of one chunk. Default is 2 MB
+        :param max_workers: how many chunks can be uploaded at the same time. Default is 1
+        :param resume: if True, rows uploaded before the failure (see checkpoint file) are skipped. Default is False
+
+        :return: updated range
+        """
+        max_workers = max(1, max_workers)
+        checkpoint_file = csv_file + '.checkpoint'
+        table_start = GridRange.from_size(left_corner_cell, 1, 1)
+
+        target = {'spreadsheet_id': self.spreadsheet.spreadsheetId, 'sheet_name': sheet_name,
+                  'left_corner_cell': left_corner_cell}
+
+        committed_rows = self._load_checkpoint(checkpoint_file, target).get('committed_rows', 0) if resume else 0
+        if committed_rows:
+            logging.info(f'Resuming upload of {csv_file} from row {committed_rows + 1}')
+
+        def upload_chunk(chunk_start: int, rows: List[list]):
+            top = table_start.start_row + chunk_start
+            chunk_range = GridRange(table_start.start_col, top,
+                                    table_start.start_col + max(len(row) for row in rows) - 1, top + len(rows) - 1)
+            self.spreadsheet.update_data(rows, chunk_range.to_a1(), sheet_name=sheet_name)
+
+        # chunk start -> chunk end, for chunks which are uploaded but can't be committed yet,
+        # because some of previous chunks are not uploaded
+        uploaded = {}
+        in_flight = {}
+        max_cols = 0
+        chunks = self._iter_csv_chunks(csv_file, chunk_bytes, skip_rows=committed_rows)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                for chunk_start, rows in chunks:
+                    max_cols = max(max_cols, max(len(row) for row in rows))
+                    future = executor.submit(upload_chunk, chunk_start, rows)
+                    in_flight[future] = (chunk_start, chunk_start + len(rows))
+                    if len(in_flight) >= max_workers * 2:
+                        break
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                if any(future.exception() for future in done):
+                    # chunks which are uploaded at the same time are kept in checkpoint too
+                    done, _ = wait(in_flight)
+
+                error = None
+                for future in done:
+                    chunk_start, chunk_end = in_flight.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+
+                    uploaded[chunk_start] = chunk_end
+
+                while committed_rows in uploaded:
+                    committed_rows = uploaded.pop(committed_rows)
+                self._save_checkpoint(checkpoint_file, committed_rows, target=target)
+
+                if error is not None:
+                    logging.error(f'Upload of {csv_file} failed. {committed_rows} rows were uploaded',
+                                  exc_info=error)
+                    raise error
+
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+
+        return GridRange.from_size(left_corner_cell, max(committed_rows, 1), max(max_cols, 1),
+                                   sheet_name=sheet_name).to_a1()
+
+    @staticmethod
+    def _iter_csv_chunks(csv_file: str, chunk_bytes: int, skip_rows: int = 0) -> Iterator[Tuple[int, List[list]]]:
+        """
+        It reads csv file lazily by chunks of rows
+
+        :param csv_file: relative or absolute path to csv file
+        :param chunk_bytes: approximate max size of one chunk in request payload
+        :param skip_rows: how many rows from the start of file should be skipped
+        :return: iterator of tuples of chunk start row (starting from 0) and chunk rows
+        """
+        chunk_start = skip_rows
+        for chunk in CsvTools.csv_iter_chunks(csv_file, chunk_bytes=chunk_bytes, skip_rows=skip_rows):
+            yield chunk_start, chunk
+            chunk_start += len(chunk)
+
+    @staticmethod
+    def _load_checkpoint(checkpoint_file: str, target: dict = None) -> dict:
+        """
+        :param checkpoint_file: file with upload/download progress
+        :param target: spreadsheet, sheet and range which the checkpoint should be made for. Default is None
+        :return: checkpoint data like {'committed_rows': 100} or empty dict if there is no checkpoint or it was made
+        for other target
+        """
+        if not os.path.exists(checkpoint_file):
+            return {}
+
+        with open(checkpoint_file, encoding='utf-8') as file:
+            checkpoint = json.load(file)
+
+        if checkpoint.get('target') != target:
+            logging.info(f'Checkpoint {checkpoint_file} was made for {checkpoint.get("target")}, not for {target}. '
+                         f'It is ignored')
+            return {}
+
+        return checkpoint
+
+    @staticmethod
+    def _save_checkpoint(checkpoint_file: str, committed_rows: int, **data):
+        """
+        :param checkpoint_file: file with upload/download progress
+        :param committed_rows: amount of uploaded/downloaded rows counting from the start of file
+        :param data: other progress data, like position in csv file
+        """
+        with open(checkpoint_file + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump({'committed_rows': committed_rows, **data}, file)
+
+        os.replace(checkpoint_file + '.tmp', checkpoint_file)
+
+    def replace_sheets_with_csv(self, csv_files: Dict[str, str], left_corner_cell='A1') -> List[str]:
+        """
+        It replaces content of many sheets with csv files. Existing sheets are cleared and missing ones are created
+        with one request, then all files are uploaded with as few requests as possible
+
+        :param csv_files: dict of relative or absolute paths to csv files by sheet names
+        :param left_corner_cell: cell name to start creating the tables in sheets
+
+        :return: updated ranges
+        """
+        self.spreadsheet.prepare_sheets(list(csv_files))
+        return self.upload_csv_files(csv_files, left_corner_cell=left_corner_cell)
+
+    def sync_csv(self, csv_file: str, sheet_name=None, left_corner_cell='A1', snapshot_file: str = None) -> int:
+        """
+        It uploads only rows of csv file which differ from the sheet. Current content of the sheet is taken from
+        snapshot file of the last sync or read with one request if there is no snapshot. Changed rows are grouped into
+        blocks of consecutive rows and sent with as few requests as possible. Rows and columns which are not in csv
+        file anymore are cleared. Values are written like in "upload_csv" (USER_ENTERED) and read unformatted. Numbers,
+        percents and booleans are compared by their values (see "_normalize_value"), so unchanged rows aren't written
+        again
+
+        :param csv_file: relative or absolute path to csv file
+        :param sheet_name: name of sheet to sync csv with. Default is None
+        :param left_corner_cell: cell name where the table starts in sheet
+        :param snapshot_file: file where rows of the last sync are kept. If None, sheet is always read. Default is None
+
+        :return: amount of updated and cleared rows
+        """
+        new_rows = CsvTools.csv_read_rows(csv_file)
+        width = max((len(row) for row in new_rows), default=0)
+        table_start = GridRange.from_size(left_corner_cell, 1, max(width, 1))
+        start_col, start_row, end_col = table_start.start_col, table_start.start_row, table_start.end_col
+
+        if snapshot_file and os.path.exists(snapshot_file):
+            with open(snapshot_file, encoding='utf-8') as file:
+                old_rows = json.load(file)
+        else:
+            # all rows and columns of the table till the end of sheet
+            column_count = self._get_grid_properties(sheet_name).get('columnCount', end_col)
+            table_range = GridRange(start_col, start_row, max(column_count, end_col))
+            old_rows = self.spreadsheet.get_data_by_range(table_range.to_a1(), sheet_name=sheet_name,
+                                                          value_render_option='UNFORMATTED_VALUE')
+        old_width = max((len(row) for row in old_rows), default=0)
+
+        # Sheet doesn't return empty cells at the end of rows, so all rows are compared with the same width
+        new_rows = [[str(value) for value in row] + [''] * (width - len(row)) for row in new_rows]
+        old_rows = [list(row[:width]) + [''] * (width - len(row)) for row in old_rows]
+
+        changed_rows = [index for index, row in enumerate(new_rows)
+                        if index >= len(old_rows) or
+                        [self._normalize_value(value) for value in old_rows[index]] !=
+                        [self._normalize_value(value) for value in row]]
+
+        with BatchWriter(self.spreadsheet) as writer:
+            for block_start, block_end in self._get_blocks(changed_rows):
+                block_range = GridRange(start_col, start_row + block_start, end_col, start_row + block_end - 1)
+                writer.update(new_rows[block_start:block_end], block_range.to_a1(), sheet_name=sheet_name)
+
+            if len(old_rows) > len(new_rows):
+                removed_range = GridRange(start_col, start_row + len(new_rows), end_col, start_row + len(old_rows) - 1)
+                writer.clear(removed_range.to_a1(), sheet_name=sheet_name)
+
+            if old_width > width and old_rows:
+                removed_range = GridRange(start_col + width, start_row, start_col + old_width - 1,
+                                          start_row + len(old_rows) - 1)
+                writer.clear(removed_range.to_a1(), sheet_name=sheet_name)
+
+        if snapshot_file:
+            with open(snapshot_file + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(new_rows, file, ensure_ascii=False)
+            os.replace(snapshot_file + '.tmp', snapshot_file)
+
+        synced_rows = len(changed_rows) + max(0, len(old_rows) - len(new_rows))
+        logging.info(f'{synced_rows} rows of {csv_file} synced')
+        return synced_rows
+
+    @staticmethod
+    def _normalize_value(value):
+        """
+        It turns csv value and unformatted value of the sheet to the same form, like '85', 85 and 85.0 to 85.0,
+        '50%' to 0.5 and 'TRUE' to True. Other values (like dates) are compared as strings
+
+        :param value: value of csv cell or of sheet cell
+        :return: value to compare
+        """
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, (int, float)):
+            return round(float(value), 10)
+
+        text = str(value).strip()
+        if text.upper() in ('TRUE', 'FALSE'):
+            return text.upper() == 'TRUE'
+
+        try:
+            if text.endswith('%'):
+                return round(float(text[:-1]) / 100, 10)
+            return round(float(text), 10)
+        except ValueError:
+            return str(value)
+
+    @staticmethod
+    def _get_blocks(indexes: List[int]) -> Iterator[Tuple[int, int]]:
+        """
+        :param indexes: sorted row indexes
+        :return: iterator of blocks of consecutive indexes like (start, end), where end is not included
+        """
+        block_start = block_end = None
+        for index in indexes:
+            if index == block_end:
+                block_end += 1
+                continue
+
+            if block_start is not None:
+                yield block_start, block_end
+            block_start, block_end = index, index + 1
+
+        if block_start is not None:
+            yield block_start, block_end
+
     def download_as_csv(self, csv_file: str, range_name: str, sheet_name=None):
         data = self.spreadsheet.get_data_by_range(range_name=range_name, sheet_name=sheet_name)
 
         CsvTools.csv_write_rows(csv_file, data, sort=True, sort_field='id')
 
+    def download_as_csv_paged(self, csv_file: str, columns: str = 'A:E', sheet_name=None, page_rows: int = 5000,
+                              prefetch=True, resume=False):
+        """
+        It downloads big sheet by pages of rows (like "A1:E5000", "A5001:E10000" and so on) and writes every page
+        to csv file as soon as it is received, so the whole sheet is never kept in memory. All rows of the sheet
+        (see its "rowCount") are requested, so gaps of empty rows don't stop the download. Empty rows at the end of
+        the sheet are not written. Amount of downloaded rows and size of csv file are saved to
+        "{csv_file}.checkpoint" file, so download can be continued after a failure. Rows are written as they are
+        in the sheet, without sorting
+
+        :param csv_file: relative or absolute path to csv file
+        :param columns: columns to download like 'A:E'
+        :param sheet_name: name of sheet to download. Default is None (the first sheet)
+        :param page_rows: how many rows are in one page. Default is 5000
+        :param prefetch: if True, next page is requested while the current one is written to file. Default is True
+        :param resume: if True, rows downloaded before the failure (see checkpoint file) are kept and download
+        continues after them. Default is False
+        """
+        checkpoint_file = csv_file + '.checkpoint'
+        sheet_columns = GridRange.parse_a1(columns)
+
+        target = {'spreadsheet_id': self.spreadsheet.spreadsheetId, 'sheet_name': sheet_name, 'columns': columns}
+
+        checkpoint = self._load_checkpoint(checkpoint_file, target) if resume else {}
+        # csv file is cut to its size at the moment of checkpoint, so rows written after it aren't duplicated
+        downloaded_rows, file_size = checkpoint.get('committed_rows', 0), checkpoint.get('file_size')
+        if file_size is None or not os.path.exists(csv_file):
+            downloaded_rows = 0
+        if downloaded_rows:
+            logging.info(f'Resuming download of {csv_file} from row {downloaded_rows + 1}')
+
+        row_count = self._get_grid_properties(sheet_name).get('rowCount')
+        pages = GridRange(sheet_columns.start_col, downloaded_rows + 1, sheet_columns.end_col,
+                          row_count).split_rows(page_rows)
+
+        def get_page(page_range: GridRange) -> Tuple[GridRange, List[list]]:
+            return page_range, self.spreadsheet.get_data_by_range(page_range.to_a1(), sheet_name=sheet_name)
+
+        def submit_next_page():
+            page_range = next(pages, None)
+            return executor.submit(get_page, page_range) if page_range is not None else None
+
+        with open(csv_file, mode='r+' if downloaded_rows else 'w', encoding='utf-8', newline='') as file, \
+                ThreadPoolExecutor(max_workers=1) as executor:
+            if downloaded_rows:
+                file.seek(file_size)
+                file.truncate()
+
+            csv_writer = csv.writer(file)
+            # Sheet doesn't return empty rows at the end of page, they are written only if there are rows after them
+            empty_rows = 0
+            next_page = submit_next_page()
+
+            while next_page is not None:
+                page_range, rows = next_page.result()
+                # If size of sheet is unknown, download stops on the first empty page
+                is_last_page = row_count is None and not rows
+                next_page = None
+                if not is_last_page and prefetch:
+                    next_page = submit_next_page()
+
+                if rows:
+                    csv_writer.writerows([[]] * empty_rows)
+                    csv_writer.writerows(rows)
+                    file.flush()
+                    downloaded_rows += empty_rows + len(rows)
+                    empty_rows = 0
+                    self._save_checkpoint(checkpoint_file, downloaded_rows, file_size=file.tell(), target=target)
+
+                empty_rows += (page_range.rows or page_rows) - len(rows)
+
+                if not is_last_page and not prefetch:
+                    next_page = submit_next_page()
+
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+
+        logging.info(f'{downloaded_rows} rows downloaded to {csv_file}')
+
+    def _get_grid_properties(self, sheet_name=None) -> dict:
+        """
+        :param sheet_name: name of sheet. Default is None (the first sheet)
+        :return: actual size of the sheet like {'rowCount': 1000, 'columnCount': 26} or empty dict if it's unknown
+        """
+        self.spreadsheet.update_sheet_list()
+        sheets = [sheet['properties'] for sheet in self.spreadsheet.sheet_list]
+        if sheet_name is None:
+            properties = min(sheets, key=lambda sheet: sheet.get('index', 0), default={})
+        else:
+            properties = self.spreadsheet.get_sheet_properties(self.spreadsheet.get_sheet_id(sheet_name))
+
+        return properties.get('gridProperties', {})
+
+    def download_as_csv_files(self, csv_files: Dict[str, str], range_name: str):
+        """
+        It downloads the same range of many sheets with one request and saves every sheet to its own csv file
+
+        :param csv_files: dict of relative or absolute paths to csv files by sheet names
+        :param range_name: can be like 'A1:B2'
+        """
+        ranges = {qualify(range_name, sheet_name): csv_file for sheet_name, csv_file in csv_files.items()}
+        data = self.spreadsheet.batch_get_data(list(ranges))
+
+        for sheet_range, csv_file in ranges.items():
+            CsvTools.csv_write_rows(csv_file, data[sheet_range], sort=bool(data[sheet_range]), sort_field='id')
+
     @staticmethod
     def _get_range(left_corner_cell: str, rows: int, cols: int) -> str:
         """
@@ -378,9 +1241,7 @@ class SpreadsheetManager:
 
         :return: cell range in "A1:B2" format
         """
-        start_cell = left_corner_cell
-        end_cell = chr(ord(start_cell[0])+cols) + str(int(start_cell[1]) + rows)
-        return start_cell + ':' + end_cell
+        return GridRange.from_size(left_corner_cell, rows, cols).to_a1()
 
 
 class Types:
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+That module provides class and functions to work with ranges of cells. It can:
+    - Parse and format A1 ("Sheet1!A1:B2", "A:C", "A5:C") and R1C1 ("R1C1:R2C3") notations
+    - Compute exact range of table by its left corner cell and size
+    - Split big ranges into windows of rows
+"""
+import re
+from typing import Iterator, Optional, Tuple
+
+
+# Sheets can't have more than 18278 columns (ZZZ), so longer names are sheet names like "Sheet1"
+_A1_CELL = re.compile(r'([A-Za-z]{0,3})(\d*)')
+_R1C1_CELL = re.compile(r'(?:[Rr](\d+))?(?:[Cc](\d+))?')
+_SIMPLE_SHEET_NAME = re.compile(r'\w+')
+
+
+def column_to_index(column: str) -> int:
+    """
+    :param column: column letters like 'A' or 'AB'
+    :return: column number starting from 1
+    """
+    if not column.isalpha():
+        raise ValueError(f'Wrong column name: {column}. Should be like "A" or "AB"')
+
+    index = 0
+    for letter in column.upper():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+
+def index_to_column(index: int) -> str:
+    """
+    :param index: column number starting from 1
+    :return: column letters like 'A' or 'AB'
+    """
+    if index < 1:
+        raise ValueError(f'Column number should start from 1, but {index} was given')
+
+    column = ''
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        column = chr(ord('A') + remainder) + column
+    return column
+
+
+def split_cell(cell: str) -> Tuple[int, int]:
+    """
+    :param cell: cell name like 'B12'
+    :return: column and row numbers starting from 1
+    """
+    match = _A1_CELL.fullmatch(cell)
+    if not match or not match.group(1) or not match.group(2):
+        raise ValueError(f'Wrong cell name: {cell}. Should be like "A1"')
+
+    return column_to_index(match.group(1)), int(match.group(2))
+
+
+def quote_sheet_name(sheet_name: str) -> str:
+    """
+    :param sheet_name: name of sheet
+    :return: sheet name which can be used in A1 notation. Names with spaces or special symbols are quoted
+    """
+    if _SIMPLE_SHEET_NAME.fullmatch(sheet_name):
+        return sheet_name
+
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+def qualify(range_name: str, sheet_name: str = None) -> str:
+    """
+    :param range_name: range like 'A1:B2'
+    :param sheet_name: name of sheet. If None, range is returned as is
+    :return: range like "Sheet1!A1:B2"
+    """
+    if not sheet_name:
+        return range_name
+
+    return f'{quote_sheet_name(sheet_name)}!{range_name}'
+
+
+class GridRange:
+    """
+    Range of cells. Columns and rows are numbered from 1 and both ends are included. Any of them can be None:
+    start means the first column/row, end means that range is open (goes till the end of sheet)
+    """
+    def __init__(self, start_col: int = None, start_row: int = None, end_col: int = None, end_row: int = None,
+                 sheet_name: str = None):
+        self.start_col = start_col
+        self.start_row = start_row
+        self.end_col = end_col
+        self.end_row = end_row
+        self.sheet_name = sheet_name
+
+    @classmethod
+    def from_size(cls, left_corner_cell: str, rows: int, cols: int, sheet_name: str = None) -> 'GridRange':
+        """
+        :param left_corner_cell: cell name like 'A1'
+        :param rows: amount of rows of the table
+        :param cols: amount of columns of the table
+        :param sheet_name: name of sheet. Default is None
+        :return: GridRange instance which exactly covers the table
+        """
+        if rows < 1 or cols < 1:
+            raise ValueError(f'Table should have at least one row and column, but {rows}x{cols} was given')
+
+        start_col, start_row = split_cell(left_corner_cell)
+        return cls(start_col, start_row, start_col + cols - 1, start_row + rows - 1, sheet_name=sheet_name)
+
+    @classmethod
+    def parse_a1(cls, range_name: str) -> 'GridRange':
+        """
+        :param range_name: range in A1 notation like "A1:B2", "'Sheet 1'!A:C", "A5:C" or just "Sheet1" (whole sheet)
+        :return: GridRange instance
+        """
+        sheet_name, cells = cls._split_sheet_name(range_name)
+
+        parsed = cls._parse_cells(cells, cls._parse_a1_cell)
+        if parsed is None:
+            if sheet_name is None and cells:
+                return cls(sheet_name=cells)
+            raise ValueError(f'Wrong range: {range_name}. Should be like "A1:B2" or "Sheet1!A1:B2"')
+
+        return cls(*parsed, sheet_name=sheet_name)
+
+    @classmethod
+    def parse_r1c1(cls, range_name: str) -> 'GridRange':
+        """
+        :param range_name: range in R1C1 notation like "R1C1:R2C3", "Sheet1!R1C1" or "C1:C3"
+        :return: GridRange instance
+        """
+        sheet_name, cells = cls._split_sheet_name(range_name)
+
+        parsed = cls._parse_cells(cells, cls._parse_r1c1_cell)
+        if parsed is None:
+            raise ValueError(f'Wrong range: {range_name}. Should be like "R1C1:R2C2" or "Sheet1!R1C1:R2C2"')
+
+        return cls(*parsed, sheet_name=sheet_name)
+
+    @property
+    def rows(self) -> Optional[int]:
+        """
+        :return: amount of rows or None if range is open
+        """
+        if self.end_row is None:
+            return None
+        return self.end_row - (self.start_row or 1) + 1
+
+    @property
+    def cols(self) -> Optional[int]:
+        """
+        :return: amount of columns or None if range is open
+        """
+        if self.end_col is None:
+            return None
+        return self.end_col - (self.start_col or 1) + 1
+
+    def to_a1(self) -> str:
+        """
+        :return: range in A1 notation like "Sheet1!A1:B2"
+        """
+        start = (index_to_column(self.start_col) if self.start_col else '') + (str(self.start_row or ''))
+        end = (index_to_column(self.end_col) if self.end_col else '') + (str(self.end_row or ''))
+
+        if not start and not end:
+            return quote_sheet_name(self.sheet_name) if self.sheet_name else ''
+
+        if start == end and self.start_col and self.start_row:
+            return qualify(start, self.sheet_name)
+
+        return qualify(f'{start or "A1"}:{end}', self.sheet_name)
+
+    def to_r1c1(self) -> str:
+        """
+        :return: range in R1C1 notation like "Sheet1!R1C1:R2C2"
+        """
+        start = (f'R{self.start_row}' if self.start_row else '') + (f'C{self.start_col}' if self.start_col else '')
+        end = (f'R{self.end_row}' if self.end_row else '') + (f'C{self.end_col}' if self.end_col else '')
+
+        if start == end:
+            return qualify(start, self.sheet_name)
+
+        return qualify(f'{start or "R1C1"}:{end}', self.sheet_name)
+
+    def split_rows(self, chunk_rows: int) -> Iterator['GridRange']:
+        """
+        It splits range into windows of rows, like "A1:E5000", "A5001:E10000" and so on.
+        If range is open at the bottom, windows never end
+
+        :param chunk_rows: how many rows are in one window
+        :return: iterator of GridRange instances
+        """
+        if chunk_rows < 1:
+            raise ValueError(f'Window should have at least one row, but {chunk_rows} was given')
+
+        first_row = self.start_row or 1
+        while self.end_row is None or first_row <= self.end_row:
+            last_row = first_row + chunk_rows - 1
+            if self.end_row is not None:
+                last_row = min(last_row, self.end_row)
+
+            yield GridRange(self.start_col or 1, first_row, self.end_col, last_row, sheet_name=self.sheet_name)
+            first_row = last_row + 1
+
+    def __str__(self):
+        return self.to_a1()
+
+    def __repr__(self):
+        return f'GridRange({self.to_a1()!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, GridRange):
+            return NotImplemented
+
+        return (self.start_col, self.start_row, self.end_col, self.end_row, self.sheet_name) == \
+               (other.start_col, other.start_row, other.end_col, other.end_row, other.sheet_name)
+
+    @staticmethod
+    def _split_sheet_name(range_name: str) -> Tuple[Optional[str], str]:
+        """
+        :param range_name: range like "'Sheet 1'!A1:B2"
+        :return: tuple of sheet name (or None) and range without it
+        """
+        if '!' not in range_name:
+            return None, range_name
+
+        sheet_name, cells = range_name.rsplit('!', 1)
+        if len(sheet_name) > 1 and sheet_name.startswith("'") and sheet_name.endswith("'"):
+            sheet_name = sheet_name[1:-1].replace("''", "'")
+
+        return sheet_name, cells
+
+    @staticmethod
+    def _parse_cells(cells: str, parse_cell) -> Optional[Tuple]:
+        """
+        :param cells: range without sheet name like "A1:B2"
+        :param parse_cell: function which parses one cell to tuple of column and row (or returns None)
+        :return: tuple of start column, start row, end column and end row or None if range is wrong
+        """
+        parts = cells.split(':')
+        if len(parts) > 2:
+            return None
+
+        start = parse_cell(parts[0])
+        end = parse_cell(parts[-1])
+        if start is None or end is None:
+            return None
+
+        return start + end
+
+    @staticmethod
+    def _parse_a1_cell(cell: str) -> Optional[Tuple]:
+        match = _A1_CELL.fullmatch(cell)
+        if not match or not cell:
+            return None
+
+        column, row = match.groups()
+        return column_to_index(column) if column else None, int(row) if row else None
+
+    @staticmethod
+    def _parse_r1c1_cell(cell: str) -> Optional[Tuple]:
+        match = _R1C1_CELL.fullmatch(cell)
+        if not match or not cell:
+            return None
+
+        row, column = match.groups()
+        return int(column) if column else None, int(row) if row else None
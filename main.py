@@ -40,20 +40,16 @@ def load_gen_students_to_spreadsheet():
     folder = 'we_study/generated_students/'
 
     student_files = os.listdir(folder)
+    csv_files = {}
 
     for student_file in student_files:
         if not student_file.endswith('.csv'):
             continue
 
         sheet_name = student_file[:-4]
+        csv_files[sheet_name] = folder + student_file
 
-        try:
-            spreadsheet.add_sheet(title=sheet_name)
-        except:
-            pass
-
-        spreadsheet.clear_data('A1:E26', sheet_name=sheet_name)
-        manager.upload_csv(folder + student_file, sheet_name=sheet_name)
+    manager.replace_sheets_with_csv(csv_files)
 
 
 def download_students_from_google_sheet():
@@ -61,22 +57,20 @@ def download_students_from_google_sheet():
 
     student_files = os.listdir(folder)
     range_name = 'A1:E26'
+    csv_files = {}
 
     for student_file in student_files:
         if not student_file.endswith('.csv'):
             continue
 
         sheet_name = student_file[:-4]
+        csv_files[sheet_name] = folder + student_file
 
-        manager.download_as_csv(folder + student_file, range_name=range_name, sheet_name=sheet_name)
+    manager.download_as_csv_files(csv_files, range_name=range_name)
 
 
 def clean_and_delete_sheets():
-    for i in range(1, 12):
-        try:
-            spreadsheet.delete_sheet(i)
-        except:
-            pass
+    spreadsheet.delete_sheets(list(range(1, 12)), ignore_missing=True)
 
 
 if __name__ == '__main__':
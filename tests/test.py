@@ -2,9 +2,25 @@
 """
 That module provides class and functions to run unit-tests to check if all work right
 """
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
 
+import requests
+
+from google_sheets import google_sheets
+from google_sheets.async_sheets import AsyncSpreadsheet
 from google_sheets.google_sheets import (Spreadsheet, SpreadsheetManager)
+from google_sheets.ranges import (GridRange, column_to_index, index_to_column, qualify)
+from utils import CsvTools
+from we_study.api import ApiManager
+from we_study.cache_backend import MemoryCache
+from we_study.data_processing import MembershipIndex
 
 
 TEST_SPREADSHEET_ID = '1ue2DuDOvhDCmUxkDh6Yk805VlfOdJxyb1fImOvySz_Q'
@@ -55,5 +71,390 @@ class GoogleSheetsTest(unittest.TestCase):
         print('done.')
 
 
+class FakeSheetsService:
+    """
+    Sheets service which keeps sheets in memory. Like Google API, it fails if sheet id is already used
+    """
+    def __init__(self):
+        self.sheets = {0: {'sheetId': 0, 'title': 'Sheet1'}}
+        self.lock = threading.Lock()
+
+    def spreadsheets(self):
+        return self
+
+    def get(self, spreadsheetId, fields=None):
+        return FakeRequest(lambda: {'sheets': [{'properties': dict(sheet)} for sheet in self.sheets.values()]})
+
+    def batchUpdate(self, spreadsheetId, body):
+        def execute():
+            # sheet ids of concurrent requests are chosen before any of them is done
+            time.sleep(0.05)
+            replies = []
+            with self.lock:
+                for request in body['requests']:
+                    properties = request['addSheet']['properties']
+                    if properties['sheetId'] in self.sheets:
+                        raise ValueError(f"Sheet with id {properties['sheetId']} already exists")
+                    self.sheets[properties['sheetId']] = dict(properties)
+                    replies += [{'addSheet': {'properties': dict(properties)}}]
+            return {'replies': replies}
+
+        return FakeRequest(execute)
+
+
+class FakeRequest:
+    def __init__(self, execute):
+        self.execute = execute
+
+
+class ConcurrentSheetsTest(unittest.TestCase):
+    def setUp(self):
+        self.service = FakeSheetsService()
+        patches = [mock.patch.dict(google_sheets._services, {'sheets': self.service}),
+                   mock.patch.object(google_sheets, '_execute', lambda request: request.execute())]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.spreadsheet = Spreadsheet()
+        self.spreadsheet.spreadsheetId = 'test'
+
+    def test_concurrent_add_sheet(self):
+        async_spreadsheet = AsyncSpreadsheet(self.spreadsheet)
+
+        async def add_sheets():
+            return await asyncio.gather(*[async_spreadsheet.add_sheet(title=f'Sheet{index}')
+                                          for index in range(2, 7)])
+
+        sheet_ids = asyncio.run(add_sheets())
+        self.assertEqual(sorted(sheet_ids), [1, 2, 3, 4, 5])
+        self.assertEqual(len(self.service.sheets), 6)
+
+        sheet_list = asyncio.run(self._get_sheet_list(async_spreadsheet))
+        self.assertEqual(len(sheet_list), 6)
+
+    @staticmethod
+    async def _get_sheet_list(async_spreadsheet):
+        return await async_spreadsheet.sheet_list
+
+
+class FakeSpreadsheet(Spreadsheet):
+    """
+    Spreadsheet which keeps cells of one sheet in memory. Like Google API, it doesn't return empty cells and rows at
+    the end of range
+    """
+    def __init__(self, rows: list = None, grid_properties: dict = None):
+        super().__init__()
+        self.spreadsheetId = 'test'
+        self.cells = {}
+        self.grid_properties = grid_properties or {}
+        self.requested_ranges = []
+        self.fail_on_request = None
+        self._lock = threading.Lock()
+        self._set_cells('A1', rows or [])
+
+    def update_sheet_list(self):
+        self._set_sheet_index([{'properties': {'sheetId': 0, 'title': 'Sheet1', 'index': 0,
+                                               'gridProperties': self.grid_properties}}])
+
+    def get_data_by_range(self, range_name, sheet_name: str = None, **kwargs):
+        self._request(range_name)
+        grid_range = GridRange.parse_a1(range_name)
+        last_row = grid_range.end_row or max([row for row, _ in self.cells] + [0])
+        last_col = grid_range.end_col or max([col for _, col in self.cells] + [0])
+
+        rows = []
+        for row in range(grid_range.start_row or 1, last_row + 1):
+            values = [self.cells.get((row, col), '') for col in range(grid_range.start_col or 1, last_col + 1)]
+            while values and values[-1] == '':
+                values.pop()
+            rows += [values]
+
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def update_data(self, data, range_name, value_input_option='USER_ENTERED', sheet_name=None):
+        self._request(range_name)
+        if value_input_option == 'USER_ENTERED':
+            # numbers are parsed like in Google Sheets
+            data = [[float(value) if value.replace('.', '', 1).isdigit() else value for value in row]
+                    for row in data]
+        self._set_cells(range_name, data)
+
+    def batch_update_data(self, data, value_input_option='USER_ENTERED'):
+        for range_name, rows in data.items():
+            self.update_data(rows, range_name.split('!')[-1], value_input_option=value_input_option)
+
+    def batch_clear_data(self, ranges):
+        for range_name in ranges:
+            self._request('clear ' + range_name)
+            grid_range = GridRange.parse_a1(range_name.split('!')[-1])
+            for row, col in list(self.cells):
+                if grid_range.start_row <= row <= grid_range.end_row and \
+                        grid_range.start_col <= col <= grid_range.end_col:
+                    del self.cells[(row, col)]
+
+    def get_rows(self) -> list:
+        return self.get_data_by_range('A1:ZZ')
+
+    def _request(self, range_name: str):
+        with self._lock:
+            self.requested_ranges += [range_name]
+            request_number = len(self.requested_ranges)
+
+        if self.fail_on_request == request_number:
+            raise ConnectionError(f'Request of {range_name} failed')
+
+    def _set_cells(self, range_name: str, rows: list):
+        grid_range = GridRange.parse_a1(range_name)
+        for row_index, row in enumerate(rows):
+            for col_index, value in enumerate(row):
+                self.cells[(grid_range.start_row + row_index, grid_range.start_col + col_index)] = value
+
+
+class SpreadsheetManagerTest(unittest.TestCase):
+    rows = [['1', 'a'], ['2', 'b'], ['3', 'c'], [], [], [], [], ['8', 'h'], ['9', 'i'], ['10', 'j']]
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.csv_file = os.path.join(folder.name, 'data.csv')
+
+    def test_download_paged_without_row_count(self):
+        spreadsheet = FakeSpreadsheet(self.rows)
+        SpreadsheetManager(spreadsheet).download_as_csv_paged(self.csv_file, 'A:B', page_rows=5)
+
+        # size of sheet is unknown, so download stops on the first empty page
+        self.assertEqual(CsvTools.csv_read_rows(self.csv_file), self.rows)
+        self.assertEqual(spreadsheet.requested_ranges, ['A1:B5', 'A6:B10', 'A11:B15'])
+
+    def test_download_paged_resume(self):
+        spreadsheet = FakeSpreadsheet(self.rows, {'rowCount': 20})
+        manager = SpreadsheetManager(spreadsheet)
+
+        spreadsheet.fail_on_request = 4
+        with self.assertRaises(ConnectionError):
+            manager.download_as_csv_paged(self.csv_file, 'A:B', page_rows=3, prefetch=False)
+
+        # row written after the last checkpoint shouldn't be duplicated
+        with open(self.csv_file, 'a', encoding='utf-8', newline='') as file:
+            file.write('8,h\r\n')
+
+        spreadsheet.fail_on_request = None
+        manager.download_as_csv_paged(self.csv_file, 'A:B', page_rows=3, resume=True)
+
+        self.assertEqual(CsvTools.csv_read_rows(self.csv_file), self.rows)
+        self.assertFalse(os.path.exists(self.csv_file + '.checkpoint'))
+
+
+    def test_upload_chunked_resume(self):
+        rows = [[str(index), 'x' * 10] for index in range(20)]
+        CsvTools.csv_write_rows(self.csv_file, rows)
+        spreadsheet = FakeSpreadsheet()
+        manager = SpreadsheetManager(spreadsheet)
+
+        # every chunk has 2 rows. Chunks before the failed one (4th) are kept in checkpoint
+        spreadsheet.fail_on_request = 4
+        with self.assertRaises(ConnectionError):
+            manager.upload_csv_chunked(self.csv_file, sheet_name='Sheet1', chunk_bytes=40, max_workers=3,
+                                       resume=True)
+
+        with open(self.csv_file + '.checkpoint', encoding='utf-8') as file:
+            self.assertEqual(json.load(file)['committed_rows'], 6)
+
+        # upload continues after the last committed chunk
+        spreadsheet.fail_on_request = None
+        spreadsheet.requested_ranges = []
+        manager.upload_csv_chunked(self.csv_file, sheet_name='Sheet1', chunk_bytes=40, max_workers=3, resume=True)
+
+        self.assertEqual(spreadsheet.requested_ranges[0], 'A7:B8')
+        self.assertEqual(spreadsheet.get_rows(), [[float(index), 'x' * 10] for index in range(20)])
+        self.assertFalse(os.path.exists(self.csv_file + '.checkpoint'))
+
+    def test_sync_csv(self):
+        spreadsheet = FakeSpreadsheet([['id', 'points', 'extra'], [1, 85, 'x'], [2, 90.0, 'y']],
+                                      {'rowCount': 100, 'columnCount': 5})
+        manager = SpreadsheetManager(spreadsheet)
+
+        # changed and new rows are written as one block, extra column is cleared
+        CsvTools.csv_write_rows(self.csv_file, [['id', 'points'], ['1', '85'], ['2', '91'], ['3', '70']])
+        self.assertEqual(manager.sync_csv(self.csv_file), 2)
+        self.assertEqual(spreadsheet.requested_ranges[1:], ['clear C1:C3', 'A3:B4'])
+        self.assertEqual(spreadsheet.get_rows(), [['id', 'points'], [1, 85], [2, 91.0], [3, 70.0]])
+
+        # numbers of the sheet are equal to csv values, so nothing is written
+        spreadsheet.requested_ranges = []
+        self.assertEqual(manager.sync_csv(self.csv_file), 0)
+        self.assertEqual(spreadsheet.requested_ranges, ['A1:E'])
+
+        CsvTools.csv_write_rows(self.csv_file, [['id', 'points'], ['1', '85']])
+        self.assertEqual(manager.sync_csv(self.csv_file), 2)
+        self.assertEqual(spreadsheet.get_rows(), [['id', 'points'], [1, 85]])
+
+    def test_get_blocks(self):
+        self.assertEqual(list(SpreadsheetManager._get_blocks([0, 1, 2, 5, 7, 8])), [(0, 3), (5, 6), (7, 9)])
+        self.assertEqual(list(SpreadsheetManager._get_blocks([])), [])
+
+
+def make_response(url: str, status_code: int, data) -> requests.Response:
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.reason = 'OK' if status_code < 400 else 'Error'
+    response._content = json.dumps(data).encode('utf-8')
+    return response
+
+
+class ApiManagerTest(unittest.TestCase):
+    base_url = 'https://userapi.webinar.ru/v3/'
+
+    def setUp(self):
+        # responses by url without base part, like {'contacts/1/user': (200, {...})}
+        self.responses = {}
+        self.requested_urls = []
+        self.api = ApiManager('token', lazy=True, cache=MemoryCache(), max_retries=0)
+        patch = mock.patch.object(self.api.session, 'get', self._get)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def _get(self, url, headers=None, timeout=None):
+        path = url[len(self.base_url):]
+        self.requested_urls += [path]
+        status_code, data = self.responses.get(path, (404, {'error': {'message': 'Not found'}}))
+        return make_response(url, status_code, data)
+
+    def test_export_skips_failed_contacts(self):
+        self.responses['contacts/1/user'] = (200, {'id': 10, 'name': 'Ivan', 'secondName': 'Ivanov',
+                                                   'email': 'ivan@example.com'})
+        self.responses['organization/users/10/statistics'] = (200, {'points': 5})
+
+        file = os.path.join(self.folder, 'user_stats.csv')
+        self.assertEqual(self.api.export_user_stats([1, 2, 3], file=file), 1)
+
+        rows = CsvTools.csv_read_rows(file)
+        self.assertEqual(rows[1:], [['1', '10', 'Ivan', 'Ivanov', 'ivan@example.com', '{"points": 5}']])
+        self.assertNotIn('organization/users/None/statistics', self.requested_urls)
+
+
+    def test_errors_are_not_cached(self):
+        self.assertIn('error', self.api.get_user(1, cache=True))
+        self.responses['contacts/1/user'] = (200, {'id': 10})
+        self.assertEqual(self.api.get_user(1, cache=True), {'id': 10})
+
+    def test_expired_cache_is_used_on_error(self):
+        self.api.cache_ttl['user_id'] = -1
+        self.responses['contacts/1/user'] = (200, {'id': 10})
+        self.api.get_user(1, cache=True)
+
+        self.responses['contacts/1/user'] = (503, {'error': {'message': 'Unavailable'}})
+        self.assertEqual(self.api.get_user(1, cache=True), {'id': 10})
+        self.assertEqual(len(self.requested_urls), 2)
+
+
+    def test_sync(self):
+        courses = {1: {'updatedAt': 'a', 'lessons': [(1, 'Intro'), (2, 'Loops')]},
+                   2: {'updatedAt': 'a', 'lessons': [(3, 'Sets')]}}
+        group_stat_requests = []
+
+        def get_course_group_stat(course_id, group_id, cache=False):
+            group_stat_requests.append(course_id)
+            return [{'lessonsPassing': [{'type': 'webinar', 'name': name, 'id': lesson_id}
+                                        for lesson_id, name in courses[course_id]['lessons']]}]
+
+        self.api.get_courses = lambda cache=False: [{'id': course_id, 'isPublish': True,
+                                                     'updatedAt': course['updatedAt']}
+                                                    for course_id, course in courses.items()]
+        self.api.get_course_details = lambda course_id, cache=False: {
+            'id': course_id, 'name': f'Course {course_id}', 'groups': [{'id': course_id * 10}]}
+        self.api.get_course_group_stat = get_course_group_stat
+        snapshot_file = os.path.join(self.folder, 'snapshot.json')
+
+        delta = self.api.sync(snapshot_file, save_data_to_file=False)
+        self.assertEqual(len(delta.added), 3)
+        self.assertEqual(sorted(group_stat_requests), [1, 2])
+
+        courses[1] = {'updatedAt': 'b', 'lessons': [(1, 'Introduction'), (4, 'Functions')]}
+        group_stat_requests.clear()
+        delta = self.api.sync(snapshot_file, save_data_to_file=False)
+
+        # unchanged course is taken from snapshot without requests
+        self.assertEqual(group_stat_requests, [1])
+        self.assertEqual(delta.added, [[4, 'Functions', 'webinar', 'Course 1']])
+        self.assertEqual(delta.removed, [[2, 'Loops', 'webinar', 'Course 1']])
+        self.assertEqual(delta.changed, [[1, 'Introduction', 'webinar', 'Course 1']])
+        self.assertEqual([lesson.lesson_id for lesson in self.api.get_course(2).lessons], [3])
+
+class RangesTest(unittest.TestCase):
+    def test_columns(self):
+        for index, column in [(1, 'A'), (26, 'Z'), (27, 'AA'), (702, 'ZZ'), (703, 'AAA')]:
+            self.assertEqual(index_to_column(index), column)
+            self.assertEqual(column_to_index(column), index)
+
+    def test_parse_and_format(self):
+        for range_name in ['A1', 'A1:B2', "'My Sheet'!A:C", 'A5:C', '1:3', 'Sheet1!AA10:AB20', "'It''s'!B2"]:
+            self.assertEqual(GridRange.parse_a1(range_name).to_a1(), range_name)
+
+        self.assertEqual(GridRange.parse_a1('Sheet1'), GridRange(sheet_name='Sheet1'))
+        self.assertEqual(GridRange.parse_r1c1('Sheet1!R1C1:R2C3'), GridRange.parse_a1('Sheet1!A1:C2'))
+        self.assertEqual(GridRange.parse_a1('B2:D4').to_r1c1(), 'R2C2:R4C4')
+        self.assertEqual(qualify('A1:B2', 'My Sheet'), "'My Sheet'!A1:B2")
+
+    def test_table_range(self):
+        self.assertEqual(SpreadsheetManager._get_range('A1', 2, 2), 'A1:B2')
+        self.assertEqual(SpreadsheetManager._get_range('A10', 3, 28), 'A10:AB12')
+
+    def test_split_rows(self):
+        windows = [str(window) for window in GridRange.parse_a1('A1:E12').split_rows(5)]
+        self.assertEqual(windows, ['A1:E5', 'A6:E10', 'A11:E12'])
+
+        open_windows = GridRange.parse_a1('A:E').split_rows(5000)
+        self.assertEqual([str(next(open_windows)) for _ in range(2)], ['A1:E5000', 'A5001:E10000'])
+
+
+class CsvToolsTest(unittest.TestCase):
+    rows = [['id', 'name'], ['10', 'b'], ['2', 'a'], ['10', 'a'], ['1', 'c']]
+
+    def test_sort_rows_by(self):
+        self.assertEqual(CsvTools.sort_rows_by('id', self.rows, key_type='int'),
+                         [['id', 'name'], ['1', 'c'], ['2', 'a'], ['10', 'b'], ['10', 'a']])
+        self.assertEqual(CsvTools.sort_rows_by(['name', 'id'], self.rows, key_type='auto', reverse=True),
+                         [['id', 'name'], ['1', 'c'], ['10', 'b'], ['10', 'a'], ['2', 'a']])
+
+    def test_sort_csv_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file = os.path.join(folder, 'rows.csv')
+            CsvTools.csv_write_rows(file, self.rows)
+            CsvTools.sort_csv_file(file, file, 'id', key_type='int', chunk_rows=2)
+
+            self.assertEqual(CsvTools.csv_read_rows(file), CsvTools.sort_rows_by('id', self.rows, key_type='int'))
+
+
+class MembershipIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = MembershipIndex()
+        self.index.add_students([3, 1, 2], 'A')
+        self.index.add_students([2, 3, 3, 10], 'B')
+
+    def test_queries(self):
+        self.assertEqual(self.index.students_in_all('A', 'B'), [2, 3])
+        self.assertEqual(self.index.students_in_any('A', 'B'), [1, 2, 3, 10])
+        self.assertEqual(self.index.enrolment_counts(), {'A': 3, 'B': 3})
+        self.assertEqual(self.index.courses_of(10), ['B'])
+        self.assertRaises(KeyError, self.index.students_in_all, 'C')
+
+    def test_save_csv(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file = os.path.join(folder, 'students_at_courses.csv')
+            self.index.save_csv(file)
+
+            self.assertEqual(CsvTools.csv_read_rows(file), [['id', 'A', 'B'], ['1', '1', '0'], ['2', '1', '1'],
+                                                            ['3', '1', '1'], ['10', '0', '1']])
+
+
 if __name__ == '__main__':
     unittest.main()
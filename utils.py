@@ -6,8 +6,13 @@ That module provides class and functions to provides other modules with useful m
     - etc...
 """
 import csv
+import heapq
 import logging
 import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Union
 
 
 class CsvTools:
@@ -33,53 +38,294 @@ class CsvTools:
 
     @staticmethod
     def csv_read_rows(file: str) -> list:
-        rows = []
-        with open(file, encoding='utf-8') as csv_file:
+        return list(CsvTools.csv_iter_rows(file))
+
+    @staticmethod
+    def csv_iter_rows(file: str, skip_header=False) -> Iterator[list]:
+        """
+        It reads rows of csv file one by one, so the whole file is never kept in memory
+
+        :param file: file to read rows from
+        :param skip_header: if True, first row is skipped. Default is False
+        :return: iterator of rows
+        """
+        with open(file, encoding='utf-8', newline='') as csv_file:
             csv_reader = csv.reader(csv_file)
-            rows += csv_reader
-        return rows
+            if skip_header:
+                next(csv_reader, None)
+
+            yield from csv_reader
+
+    @staticmethod
+    def csv_iter_records(file: str, types: Dict[str, Callable] = None) -> Iterator[dict]:
+        """
+        It reads rows of csv file one by one as dicts by header row fields
+
+        :param file: file to read rows from
+        :param types: functions to convert values of some fields, like {'id': int}. Other values are kept as strings.
+        Default is None
+        :return: iterator of dicts
+        """
+        types = types or {}
+        with open(file, encoding='utf-8', newline='') as csv_file:
+            for record in csv.DictReader(csv_file):
+                for field, convert in types.items():
+                    record[field] = convert(record[field])
+
+                yield record
 
     @staticmethod
-    def csv_writer(filename: str, mode: str = 'w'):
+    def csv_iter_chunks(file: str, chunk_rows: int = None, chunk_bytes: int = None, skip_rows: int = 0) \
+            -> Iterator[List[list]]:
+        """
+        It reads csv file by chunks of rows, so only one chunk is kept in memory
+
+        :param file: file to read rows from
+        :param chunk_rows: max amount of rows in one chunk. Default is None
+        :param chunk_bytes: approximate max size of one chunk, when it's sent as JSON. Default is None
+        :param skip_rows: how many rows from the start of file should be skipped. Default is 0
+        :return: iterator of lists of rows
+        """
+        if not chunk_rows and not chunk_bytes:
+            raise ValueError('chunk_rows or chunk_bytes should be provided')
+
+        chunk, chunk_size = [], 0
+        for row_index, row in enumerate(CsvTools.csv_iter_rows(file)):
+            if row_index < skip_rows:
+                continue
+
+            # every value is sent as JSON string: quotes and comma around it
+            row_size = sum(len(value.encode('utf-8')) + 3 for value in row) + 2
+            if chunk and (chunk_rows and len(chunk) == chunk_rows or
+                          chunk_bytes and chunk_size + row_size > chunk_bytes):
+                yield chunk
+                chunk, chunk_size = [], 0
+
+            chunk += [row]
+            chunk_size += row_size
+
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def csv_writer(filename: str, mode: str = 'w', buffer_size: int = -1) -> 'BufferedCsvWriter':
         """
 
         :param filename: relative/absolute path to file to work with
         :param mode: can be 'w' or 'a'. Default is 'w'
+        :param buffer_size: size of file buffer in bytes. Default is -1 (system default)
 
-        :return: csv.writer instance
+        :return: BufferedCsvWriter instance. It has the same methods as csv.writer, should be closed or used
+        as context manager
         """
-        if mode not in ['w', 'a']:
-            raise ValueError(f"Can't open file in that mode. Only can in 'w' or 'a', but {mode} was given")
-
-        file = open(filename, mode=mode, encoding='utf-8', newline='')
-        csv_writer = csv.writer(file)
-        return csv_writer
+        return BufferedCsvWriter(filename, mode=mode, buffer_size=buffer_size)
 
     @staticmethod
-    def sort_rows_by(field_name: str, rows: list) -> list:
+    def sort_rows_by(field_name: Union[str, List[str]], rows: list, key_type: Union[str, Callable] = None,
+                     reverse=False) -> list:
         """
-        It sorts list of lists (which called 'rows' in that case) by certain "field_name" in first row (header row)
+        It sorts list of lists (which called 'rows' in that case) by certain "field_name" in first row (header row).
+        Sorting is stable, so rows with equal values keep their order
 
-        :param field_name: field/column name to sort by
+        :param field_name: field/column name to sort by. Can be a list of names, then rows are sorted by the first one,
+        rows with equal first values are sorted by the second one and so on
         :param rows: rows to sort
+        :param key_type: how to compare values: 'int', 'float', 'str', 'auto' (numbers before strings) or any function
+        which takes value and returns key. If None, values are compared as they are. Default is None
+        :param reverse: if True, rows are sorted in descending order. Default is False
         :return: sorted rows
         """
-        if field_name not in rows[0]:
-            raise ValueError(f'There is "{field_name}" field in rows')
+        key = CsvTools._get_sort_key(rows[0], field_name, key_type)
+        return [rows[0]] + sorted(rows[1:], key=key, reverse=reverse)
+
+    @staticmethod
+    def sort_csv_file(file: str, output_file: str, field_name: Union[str, List[str]],
+                      key_type: Union[str, Callable] = None, reverse=False, chunk_rows: int = 100000):
+        """
+        It sorts csv file which is too big to be kept in memory (external merge sort). File is read by chunks of
+        "chunk_rows" rows, every chunk is sorted and saved to temporary file and then all of them are merged.
+        First row of file should be header row
+
+        :param file: file to sort
+        :param output_file: file to write sorted rows to. It can be the same file
+        :param field_name: field/column name or list of names to sort by (see "sort_rows_by")
+        :param key_type: how to compare values (see "sort_rows_by"). Values in csv files are strings, so use 'int'
+        or 'auto' for numbers. Default is None
+        :param reverse: if True, rows are sorted in descending order. Default is False
+        :param chunk_rows: how many rows are sorted in memory at once. Default is 100000
+        """
+        with tempfile.TemporaryDirectory() as temp_folder:
+            chunk_files = []
+            with open(file, encoding='utf-8', newline='') as csv_file:
+                csv_reader = csv.reader(csv_file)
+                headers = next(csv_reader)
+                key = CsvTools._get_sort_key(headers, field_name, key_type)
+
+                chunk = []
+                for row in csv_reader:
+                    chunk += [row]
+                    if len(chunk) == chunk_rows:
+                        chunk_files += [CsvTools._write_sorted_chunk(temp_folder, chunk, key, reverse)]
+                        chunk = []
 
-        col = rows[0].index(field_name)  # get column index of "field_name"
-        sorted_col = sorted([field[col] for field in rows[1:]])  # get all its members and sort them
-        sorted_rows = []
+                if chunk or not chunk_files:
+                    chunk_files += [CsvTools._write_sorted_chunk(temp_folder, chunk, key, reverse)]
+
+            readers = [open(chunk_file, encoding='utf-8', newline='') for chunk_file in chunk_files]
+            try:
+                with open(output_file, 'w', encoding='utf-8', newline='') as csv_file:
+                    csv_writer = csv.writer(csv_file)
+                    csv_writer.writerow(headers)
+                    # merge is stable: rows with equal keys are taken from earlier chunks first
+                    csv_writer.writerows(heapq.merge(*[csv.reader(reader) for reader in readers],
+                                                     key=key, reverse=reverse))
+            finally:
+                for reader in readers:
+                    reader.close()
+
+    @staticmethod
+    def _write_sorted_chunk(folder: str, rows: list, key: Callable, reverse: bool) -> str:
+        """
+        :param folder: folder to save chunk file to
+        :param rows: rows of chunk
+        :param key: sort key
+        :param reverse: if True, rows are sorted in descending order
+        :return: path to chunk file
+        """
+        fd, chunk_file = tempfile.mkstemp(suffix='.csv', dir=folder)
+        with open(fd, 'w', encoding='utf-8', newline='') as file:
+            csv.writer(file).writerows(sorted(rows, key=key, reverse=reverse))
+        return chunk_file
+
+    @staticmethod
+    def _get_sort_key(headers: list, field_name: Union[str, List[str]], key_type: Union[str, Callable]) -> Callable:
+        """
+        :param headers: header row
+        :param field_name: field/column name or list of names to sort by
+        :param key_type: how to compare values (see "sort_rows_by")
+        :return: function which takes row and returns its sort key
+        """
+        field_names = [field_name] if isinstance(field_name, str) else list(field_name)
+        for name in field_names:
+            if name not in headers:
+                raise ValueError(f'There is no "{name}" field in rows')
 
-        for field_value in sorted_col:
-            for row in rows[1:]:
-                if field_value == row[col]:
-                    sorted_rows += [row]
-                    break
+        cols = [headers.index(name) for name in field_names]  # get column indexes of fields
+
+        if key_type is None:
+            convert = None
+        elif callable(key_type):
+            convert = key_type
+        elif key_type in SORT_KEY_TYPES:
+            convert = SORT_KEY_TYPES[key_type]
+        else:
+            raise ValueError(f"Unknown key type: {key_type}. Can be {', '.join(SORT_KEY_TYPES)} or function")
+
+        if convert is None:
+            if len(cols) == 1:
+                col = cols[0]
+                return lambda row: row[col]
+            return lambda row: tuple(row[col] for col in cols)
+
+        if len(cols) == 1:
+            col = cols[0]
+            return lambda row: convert(row[col])
+        return lambda row: tuple(convert(row[col]) for col in cols)
+
+
+class BufferedCsvWriter:
+    """
+    Writer of csv file with configurable buffer. Use it as context manager, so file is always closed:
+
+        with BufferedCsvWriter('file.csv', buffer_size=1024 * 1024) as csv_writer:
+            csv_writer.writerows(rows)
+    """
+    def __init__(self, filename: str, mode: str = 'w', buffer_size: int = -1):
+        """
+        :param filename: relative/absolute path to file to work with
+        :param mode: can be 'w' or 'a'. Default is 'w'
+        :param buffer_size: size of file buffer in bytes. Default is -1 (system default)
+        """
+        if mode not in ['w', 'a']:
+            raise ValueError(f"Can't open file in that mode. Only can in 'w' or 'a', but {mode} was given")
+
+        self.file = open(filename, mode=mode, encoding='utf-8', newline='', buffering=buffer_size)
+        self._csv_writer = csv.writer(self.file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def writerow(self, row: list):
+        self._csv_writer.writerow(row)
+
+    def writerows(self, rows):
+        self._csv_writer.writerows(rows)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _auto_key(value) -> tuple:
+    """
+    :param value: any value
+    :return: key which puts numbers (in numeric order) before other values (in string order)
+    """
+    try:
+        return 0, float(value), ''
+    except (TypeError, ValueError):
+        return 1, 0.0, str(value)
+
+
+# Functions which turn values to sort keys
+SORT_KEY_TYPES = {
+    'int': int,
+    'float': float,
+    'str': str,
+    'auto': _auto_key
+}
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that allows not more than "rate" calls per "period" seconds (token bucket).
+    Call "acquire" before every request and it will wait if the limit is reached
+    """
+    def __init__(self, rate: float, period: float = 1.0):
+        """
+        :param rate: how many calls are allowed per period
+        :param period: period length in seconds. Default is 1 second
+        """
+        if rate <= 0 or period <= 0:
+            raise ValueError(f'rate and period should be positive, but {rate} and {period} were given')
+
+        self.rate = rate
+        self.period = period
+        self._allowance = float(rate)
+        self._last_check = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        It blocks until the next call is allowed
+        """
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._allowance = min(self.rate,
+                                      self._allowance + (now - self._last_check) * self.rate / self.period)
+                self._last_check = now
 
-        sorted_rows.insert(0, rows[0])
+                if self._allowance >= 1:
+                    self._allowance -= 1
+                    return
 
-        return sorted_rows
+                time.sleep((1 - self._allowance) * self.period / self.rate)
 
 
 def clean_logs():
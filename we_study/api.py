@@ -2,67 +2,142 @@
 """
 That module provides class and functions to work with WE STUDY API and process obtained data
 """
+import csv
+import hashlib
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
 from pprint import pprint
-from typing import Union, List
+from typing import Union, List, Callable, Iterable, Optional
 import os
 
 import requests as rq
+from requests.adapters import HTTPAdapter
 
-from utils import (CsvTools, script_place, logger)
+from utils import (CsvTools, RateLimiter, script_place, logger)
+from we_study.cache_backend import (CacheBackend, MemoryCache, SqliteCache)
+from we_study.models import (Course, Lesson, Student)
+
+
+# Response codes after which request will be sent again
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# How many seconds cached responses of every endpoint are valid
+DEFAULT_CACHE_TTL = {
+    'courses': 60 * 60,
+    'groups': 60 * 60,
+    'course': 60 * 60,
+    'course_group_stat': 10 * 60,
+    'user_stat': 10 * 60,
+    'user_id': 24 * 60 * 60,
+}
 
 
 class API:
     """
     Class that provides functions to work with WE STUDY API
     """
-    def __init__(self, api_token: str):
+    def __init__(self, api_token: str, timeout: float = 30, max_retries: int = 3, backoff_factor: float = 0.5,
+                 requests_per_second: float = None, pool_size: int = 10,
+                 cache: CacheBackend = None, cache_ttl: dict = None):
+        """
+        :param api_token: API token to access We Study API
+        :param timeout: how many seconds to wait for server response. Default is 30
+        :param max_retries: how many times failed request will be sent again. Default is 3
+        :param backoff_factor: delay before the first retry in seconds. It doubles with every next retry.
+        "Retry-After" header of the response has priority over it. Default is 0.5
+        :param requests_per_second: if provided, requests will be sent not more often than that. Default is None
+        :param pool_size: how many connections to keep open in the pool. Default is 10
+        :param cache: cache backend to keep responses in. Default is SqliteCache in "cache" folder
+        :param cache_ttl: how many seconds cached responses are valid, by endpoint name (see DEFAULT_CACHE_TTL).
+        Given values override default ones
+        """
         self.API_TOKEN = api_token
         self.headers = {
             'x-auth-token': self.API_TOKEN,
             'Content-Type': 'application/x-www-form-urlencoded'
         }
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.rate_limiter = RateLimiter(requests_per_second) if requests_per_second else None
+
+        # One session keeps connections to the server alive between requests
+        self.session = rq.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+        if cache is None:
+            cache = SqliteCache(os.path.dirname(__file__) + '/cache/cache.sqlite3')
+        self.cache = cache
+        self.cache_ttl = {**DEFAULT_CACHE_TTL, **(cache_ttl or {})}
+        self._cache_stats = {'hit': 0, 'revalidated': 0, 'miss': 0}
+        self._cache_stats_lock = threading.Lock()
+
+    @property
+    def cache_stats(self) -> dict:
+        """
+        :return: how many cacheable requests were taken from cache ('hit'), confirmed by server as unchanged
+        ('revalidated') and downloaded ('miss')
+        """
+        with self._cache_stats_lock:
+            return dict(self._cache_stats)
+
+    def close(self):
+        """
+        It closes all open connections
+        """
+        self.session.close()
+        if isinstance(self.cache, SqliteCache):
+            self.cache.close()
 
     # Getting list of all courses
     def get_courses(self, cache=False) -> list:
         url = 'https://userapi.webinar.ru/v3/organization/courses'
-        res = self._get_request(url, cache_filename='courses.json', use_cache=cache)
+        res = self._get_request(url, cache_key='courses', use_cache=cache, cache_ttl=self.cache_ttl['courses'])
         return res['data']
 
     # Getting list of all groups
     def get_groups(self, cache=False):
         url = 'https://userapi.webinar.ru/v3/organization/courses/groups'
-        res = self._get_request(url, cache_filename='groups.json', use_cache=cache)
+        res = self._get_request(url, cache_key='groups', use_cache=cache, cache_ttl=self.cache_ttl['groups'])
 
         return res
 
     # Getting information about course
     def get_course_details(self, course_id: int, cache=False) -> dict:
         url = f'https://userapi.webinar.ru/v3/courses/{course_id}'
-        res = self._get_request(url, use_cache=cache, cache_filename=f'course-{course_id}.json')
+        res = self._get_request(url, use_cache=cache, cache_key=f'course-{course_id}',
+                                cache_ttl=self.cache_ttl['course'])
 
+        # response can be shared with cache, so it is copied instead of changing
         useless_fields = ['additionalFields', 'owner', 'certSetting', 'visibilityStatus']
-        for field in useless_fields:
-            res.pop(field)
-
-        return res
+        return {field: value for field, value in res.items() if field not in useless_fields}
 
     # Getting user statistics
-    def get_user_stat(self, user_id: int):
+    def get_user_stat(self, user_id: int, cache=False, raise_errors=False):
         url = f'https://userapi.webinar.ru/v3/organization/users/{user_id}/statistics'
-        res = self._get_request(url)
+        res = self._get_request(url, use_cache=cache, cache_key=f'user-{user_id}-stat',
+                                cache_ttl=self.cache_ttl['user_stat'], raise_errors=raise_errors)
 
         return res
 
-    def get_user_id(self, contact_id: int) -> int:
+    # Getting user of contact
+    def get_user(self, contact_id: int, cache=False, raise_errors=False) -> dict:
         url = f'https://userapi.webinar.ru/v3/contacts/{contact_id}/user'
-        res = self._get_request(url)
+        res = self._get_request(url, use_cache=cache, cache_key=f'contact-{contact_id}-user',
+                                cache_ttl=self.cache_ttl['user_id'], raise_errors=raise_errors)
+
+        return res
 
-        return res['id']
+    def get_user_id(self, contact_id: int, cache=False) -> int:
+        return self.get_user(contact_id, cache=cache)['id']
 
     def get_course_group_stat(self, course_id: int, group_id: int, cache=False):
         url = f'https://userapi.webinar.ru/v3/courses/{course_id}/groups/{group_id}/statistics'
-        res = self._get_request(url, use_cache=cache, cache_filename=f'course-{course_id}-group-{group_id}.json')
+        res = self._get_request(url, use_cache=cache, cache_key=f'course-{course_id}-group-{group_id}',
+                                cache_ttl=self.cache_ttl['course_group_stat'])
 
         return res
 
@@ -71,108 +146,326 @@ class API:
                      headers: dict = None,
                      json_frm: bool = True,
                      use_cache: bool = True,
-                     cache_filename: str = '') -> Union[dict, rq.Response]:
+                     cache_key: str = '',
+                     cache_ttl: float = None,
+                     raise_errors: bool = False) -> Union[dict, rq.Response]:
         """
         Function just send GET-request to We Study API
 
         :param url: some API url
         :param headers: provide some custom headers. If not, than default will be used
         :param json_frm: if True will turn Response instance in JSON format
-        :param use_cache: if True will save response to cache file
-        :param cache_filename: name of cache filename which futher will be get access to
+        :param use_cache: if True will save response to cache
+        :param cache_key: key of cache entry which futher will be get access to
+        :param cache_ttl: how many seconds cache entry is valid. If None, it never expires
+        :param raise_errors: if True, requests.HTTPError will be raised when server returns error status.
+        Otherwise, error response is returned as it is
 
         :return: the Response instance or dict/json format data
         """
 
-        # load from cache if exist and it is allowed to use cache (use_cache = True)
-        if json_frm and use_cache and cache_filename and \
-                os.path.exists(os.path.dirname(__file__) + '/cache/' + cache_filename):
+        cacheable = json_frm and use_cache and cache_key
+        stale_entry = None
 
-            res = self._load_cache(os.path.dirname(__file__) + '/cache/' + cache_filename)
+        # load from cache if exist and it is allowed to use cache (use_cache = True)
+        if cacheable:
+            res = self.cache.get(cache_key)
             if res:
+                self._count_cache('hit')
                 return res
 
+            stale_entry = self.cache.get_stale(cache_key)
+
         if headers:
-            headers = headers
+            headers = dict(headers)
         else:
-            headers = self.headers
+            headers = dict(self.headers)
+
+        # Ask server to send data only if it has changed since it was cached
+        if stale_entry:
+            validators = stale_entry[1]
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
 
         # Sending requests
-        response = rq.get(url, headers=headers)
+        response = self._send_request(url, headers)
+
+        if stale_entry:
+            cached_res, validators = stale_entry
+            if response.status_code == 304 or \
+                    (response.ok and validators.get('hash') == self._get_content_hash(response)):
+                self.cache.refresh(cache_key, ttl=cache_ttl)
+                self._count_cache('revalidated')
+                return cached_res
+
+            # Server can't send fresh data, so expired one is better than error
+            if not response.ok:
+                logger.warning(f'Got {response.status_code} from {url}. Expired cached data of {cache_key} is used')
+                return cached_res
+
+        if raise_errors and not response.ok:
+            logger.error(f'Got {response.status_code} from {url}')
+            response.raise_for_status()
+
+        if cacheable:
+            self._count_cache('miss')
+            validators = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'hash': self._get_content_hash(response)
+            }
+
+        response_ok = response.ok
 
         # Format response data to JSON
         if json_frm:
             response = response.json()
 
-        # save to cache if is allowed to use cache (use_cache = True)
-        if json_frm and use_cache and cache_filename and response:
-            self._save_cache(os.path.dirname(__file__) + '/cache/' + cache_filename, response)
+        # save to cache if is allowed to use cache (use_cache = True). Errors are never cached
+        if cacheable and response_ok and response:
+            self.cache.set(cache_key, response, ttl=cache_ttl, validators=validators)
 
         return response
 
-    # Load a cache from file
-    @staticmethod
-    def _load_cache(cache_file: str):
-        with open(cache_file, 'r') as file:
-            res = json.load(file)
-            return res
+    def _count_cache(self, counter: str):
+        with self._cache_stats_lock:
+            self._cache_stats[counter] += 1
 
-    # Save data to cache file
     @staticmethod
-    def _save_cache(cache_file: str, res: dict):
-        with open(cache_file, 'w') as file:
-            json.dump(res, file)
+    def _get_content_hash(response: rq.Response) -> str:
+        """
+        :param response: the Response instance
+        :return: hash of response body to find out if it has changed, when server doesn't send ETag
+        """
+        return hashlib.sha1(response.content).hexdigest()
+
+    def _send_request(self, url: str, headers: dict) -> rq.Response:
+        """
+        It sends GET-request with the session. If server is not available or asks to slow down,
+        request will be sent again after a delay (up to "max_retries" times)
+
+        :param url: some API url
+        :param headers: request headers
+        :return: the Response instance
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (rq.ConnectionError, rq.Timeout):
+                if attempt == self.max_retries:
+                    logger.error(f'Request to {url} failed', exc_info=True)
+                    raise
+
+                delay = self._get_backoff(attempt)
+                logger.warning(f'Request to {url} failed. Retrying in {delay} seconds')
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+
+            delay = self._get_retry_after(response)
+            if delay is None:
+                delay = self._get_backoff(attempt)
+
+            logger.warning(f'Got {response.status_code} from {url}. Retrying in {delay} seconds')
+            time.sleep(delay)
+
+    def _get_backoff(self, attempt: int) -> float:
+        """
+        :param attempt: number of failed attempt starting from 0
+        :return: delay before the next attempt in seconds
+        """
+        return self.backoff_factor * 2 ** attempt
 
-    # Clean all cache files
     @staticmethod
-    def clean_cache():
-        folder = os.path.dirname(__file__) + '/cache/'
-        files = os.listdir(folder)
-        for file in files:
-            os.remove(folder + file)
+    def _get_retry_after(response: rq.Response) -> Optional[float]:
+        """
+        :param response: the Response instance
+        :return: delay from "Retry-After" header in seconds or None if there is no such header
+        """
+        retry_after = response.headers.get('Retry-After')
+        if not retry_after:
+            return None
+
+        if retry_after.isdigit():
+            return float(retry_after)
+
+        try:
+            retry_date = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+
+        return max(0.0, retry_date.timestamp() - time.time())
+
+    # Remove one cache entry, e.g. 'courses' or 'course-49185-group-60257'
+    def invalidate_cache(self, cache_key: str):
+        self.cache.invalidate(cache_key)
+
+    # Clean all cache entries
+    def clean_cache(self):
+        self.cache.clear()
 
 
 class ApiManager(API):
     """
     Class provides easy-to-use methods to work with API class which work with We Study API
     """
-    def __init__(self, api_token: str, use_cache=True):
+    # Only these fields of users are kept in memory to build Student instances
+    USER_FIELDS = ('id', 'name', 'secondName', 'email')
+
+    def __init__(self, api_token: str, use_cache=True, max_workers: int = 1, lazy=False, max_contacts: int = 10000,
+                 **kwargs):
         """
         :param api_token: API token to access We Study API
         :param use_cache: if True, it will save data to cache and get data from it. Default is True
+        :param max_workers: how many requests can be sent at the same time while collecting courses data.
+        Default is 1 (requests are sent one by one)
+        :param lazy: if True, courses are collected on first access to "courses" and lessons of every course
+        on first access to its "lessons" (or by "prefetch" call). Otherwise, all data is collected on init.
+        Default is False
+        :param max_contacts: how many users of contacts are kept in memory (see "get_student"). Least recently used
+        ones are dropped first. Default is 10000
+        :param kwargs: connection options of API class (timeout, max_retries, backoff_factor, requests_per_second,
+        pool_size)
         """
-        super().__init__(api_token)
-        self.courses: List[Course] = []
+        kwargs.setdefault('pool_size', max(max_workers, 10))
+        super().__init__(api_token, **kwargs)
+        self._courses: Optional[List[Course]] = None
+        self._courses_by_id = {}
+        self._contact_users = MemoryCache(max_contacts)
         self.use_cache = use_cache
+        self.max_workers = max(1, max_workers)
+        self.lazy = lazy
+
+        if not lazy:
+            self._get_courses_as_list()
+            self._get_course_structure(self._courses)
+
+    @property
+    def courses(self) -> List['Course']:
+        """
+        :return: list of Course instances of all published courses
+        """
+        if self._courses is None:
+            self._get_courses_as_list()
 
-        self._get_courses_as_list()
-        self._get_course_structure()
+        return self._courses
+
+    def get_course(self, course_id: int) -> 'Course':
+        """
+        :param course_id: id of the course
+        :return: Course instance. If there is no published course with that id, KeyError will be raised
+        """
+        if self._courses is None:
+            self._get_courses_as_list()
+
+        course = self._courses_by_id.get(course_id)
+        if course is None:
+            raise KeyError(f'There is no published course with {course_id} id')
+
+        return course
+
+    def prefetch(self, course_ids: Iterable[int] = None):
+        """
+        It collects lessons of several courses at once (concurrently if "max_workers" is more than 1)
+
+        :param course_ids: ids of courses to collect lessons of. If None, lessons of all courses will be collected
+        """
+        if course_ids is None:
+            courses = self.courses
+        else:
+            courses = [self.get_course(course_id) for course_id in course_ids]
+
+        self._get_course_structure([course for course in courses if not course.lessons_loaded])
+
+    def _map(self, func: Callable, items: Iterable) -> list:
+        """
+        It calls "func" for every item. If "max_workers" is more than 1, calls are made concurrently in a thread pool
+
+        :param func: function which takes one item
+        :param items: items to process
+        :return: results in the same order as items were given
+        """
+        items = list(items)
+        if self.max_workers == 1 or len(items) < 2:
+            return [func(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            return list(executor.map(func, items))
 
     def _get_courses_as_list(self):
         """
         Collecting all courses data an save it as a list of Course instances
         """
         raw_courses = self.get_courses(cache=self.use_cache)
-        for course in raw_courses:
-            if not course['isPublish']:
-                continue
-            course_details = self.get_course_details(course['id'])
-            self.courses += [Course(course_details['id'],
-                                    course_details['name'],
-                                    [id['id'] for id in course_details['groups']])]
+        published_courses = [course for course in raw_courses if course['isPublish']]
 
-    def _get_course_structure(self):
+        all_details = self._map(lambda course: self.get_course_details(course['id']), published_courses)
+        self._set_courses([Course(course_details['id'],
+                                  course_details['name'],
+                                  [id['id'] for id in course_details['groups']],
+                                  lessons_loader=self._load_course_lessons)
+                           for course_details in all_details])
+
+    def _set_courses(self, courses: List['Course']):
         """
-        Add lessons information to all Course instances
+        It saves courses and indexes them by id
+
+        :param courses: Course instances
         """
-        for course in self.courses:
-            for group_id in course.groups_id:
-                structure = self.get_course_group_stat(course.id, group_id, cache=self.use_cache)
-                lessons_data = structure[0]['lessonsPassing']
-                for lesson in lessons_data:
-                    course.lessons += [Lesson(lesson['type'],
-                                              lesson['name'],
-                                              lesson['id'])]
+        self._courses = courses
+        self._courses_by_id = {course.id: course for course in courses}
+
+    def _get_course_structure(self, courses: List['Course']):
+        """
+        Add lessons information to given Course instances
+
+        :param courses: Course instances to collect lessons of
+        """
+        course_groups = [(course, group_id) for course in courses for group_id in course.groups_id]
+
+        structures = self._map(
+            lambda course_group: self.get_course_group_stat(course_group[0].id, course_group[1], cache=self.use_cache),
+            course_groups
+        )
+
+        lessons = {course.id: [] for course in courses}
+        for (course, group_id), structure in zip(course_groups, structures):
+            lessons[course.id].extend(self._get_lessons(structure))
+
+        for course in courses:
+            course.lessons = lessons[course.id]
+
+    def _load_course_lessons(self, course: 'Course') -> List['Lesson']:
+        """
+        It collects lessons of one course. It's called by Course instance on first access to its lessons
+
+        :param course: Course instance
+        :return: list of Lesson instances
+        """
+        structures = self._map(lambda group_id: self.get_course_group_stat(course.id, group_id, cache=self.use_cache),
+                               course.groups_id)
+
+        lessons = []
+        for structure in structures:
+            lessons.extend(self._get_lessons(structure))
+
+        return lessons
+
+    @staticmethod
+    def _get_lessons(structure: list) -> List['Lesson']:
+        """
+        :param structure: response of "get_course_group_stat"
+        :return: list of Lesson instances
+        """
+        lessons_data = structure[0]['lessonsPassing']
+        return [Lesson(lesson['type'], lesson['name'], lesson['id']) for lesson in lessons_data]
 
     def get_courses_data(self, save_data_to_file=True, file: str = None) -> List[list]:
         """
@@ -236,30 +529,231 @@ class ApiManager(API):
 
         return rows
 
+    def get_student(self, contact_id: int) -> 'Student':
+        """
+        It gets user of contact and his statistics. Only a few fields of users of recently used contacts (see
+        "max_contacts") are kept in memory, so user of the same contact isn't requested again
+
+        :param contact_id: contact id of the student
+        :return: Student instance with statistics. If user or statistics can't be received, requests.HTTPError will
+        be raised
+        """
+        user = self._contact_users.get(contact_id)
+        if user is None:
+            user = self.get_user(contact_id, cache=self.use_cache, raise_errors=True)
+            user = {field: user.get(field) for field in self.USER_FIELDS}
+            self._contact_users.set(contact_id, user)
+
+        statistics = self.get_user_stat(user['id'], cache=self.use_cache, raise_errors=True)
+        return Student.from_user(contact_id, user, statistics)
+
+    def export_user_stats(self, contact_ids: Iterable[int], file: str = None, file_format: str = 'csv') -> int:
+        """
+        It gets statistics of many students concurrently (see "max_workers") and writes every student to file as soon
+        as his data is received. Not more than "max_workers" * 2 students are kept in memory at the same time,
+        so "contact_ids" can be a generator of any length. Students who can't be received are logged and skipped
+
+        :param contact_ids: contact ids of students
+        :param file: filename where to save data. Default is "data/user_stats.csv" (or ".jsonl")
+        :param file_format: can be 'csv' or 'jsonl'. Default is 'csv'
+        :return: amount of exported students
+        """
+        if file_format not in ['csv', 'jsonl']:
+            raise ValueError(f"Can't export in that format. Only 'csv' or 'jsonl' can be, but {file_format} was given")
 
-class Course:
-    def __init__(self, course_id: int, name: str, groups_id: list):
-        self.id = course_id
-        self.name = name
-        self.groups_id: list = groups_id
-        self.lessons: List[Lesson] = []
+        if file is None:
+            file = script_place(__file__) + f'data/user_stats.{file_format}'
+
+        exported = 0
+        max_in_flight = self.max_workers * 2
+        with open(file, 'w', encoding='utf-8', newline='') as output, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            csv_writer = csv.writer(output) if file_format == 'csv' else None
+            if csv_writer:
+                csv_writer.writerow(Student.fields)
+
+            in_flight = {}
+            contact_ids = iter(contact_ids)
+            while True:
+                for contact_id in contact_ids:
+                    in_flight[executor.submit(self.get_student, contact_id)] = contact_id
+                    if len(in_flight) >= max_in_flight:
+                        break
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    contact_id = in_flight.pop(future)
+                    try:
+                        student = future.result()
+                    except Exception:
+                        logger.error(f"Can't get statistics of contact {contact_id}", exc_info=True)
+                        continue
+
+                    if csv_writer:
+                        csv_writer.writerow(student.to_row())
+                    else:
+                        output.write(json.dumps(student.to_dict(), ensure_ascii=False) + '\n')
+                    exported += 1
+
+        logger.info(f'Statistics of {exported} students exported to {file}')
+        return exported
+
+    def sync(self, snapshot_file: str = None, save_data_to_file=True, delta_file: str = None) -> 'SyncDelta':
+        """
+        It updates courses and lessons data incrementally. Fresh list of courses is compared with the snapshot of
+        the last sync and only new or changed courses (by "updatedAt" field or hash of course data) are downloaded.
+        Unchanged courses are taken from the snapshot without any requests. Cached statistics of changed courses are
+        dropped, so they are always downloaded again. ApiManager should be created with lazy=True, otherwise all
+        courses are already downloaded on init and ValueError will be raised
+
+        :param snapshot_file: file where snapshot of the last sync is kept. Default is "data/snapshot.json"
+        :param save_data_to_file: if True it will save courses and lessons data to "data/courses.csv" and
+        "data/lessons.csv" files and the delta to "delta_file"
+        :param delta_file: filename where to save the delta. Default is "data/lessons_delta.csv"
+        :return: SyncDelta instance with added, removed and changed lessons
+        """
+        if not self.lazy:
+            raise ValueError('Sync can be used only with lazy=True. Otherwise, all courses are downloaded on init')
 
+        if snapshot_file is None:
+            snapshot_file = script_place(__file__) + 'data/snapshot.json'
+        if delta_file is None:
+            delta_file = script_place(__file__) + 'data/lessons_delta.csv'
 
-class Lesson:
-    def __init__(self, lesson_type: str, name: str, lesson_id: int):
-        self.lesson_type = lesson_type
-        self.name = name
-        self.lesson_id = lesson_id
+        old_snapshot = self._load_snapshot(snapshot_file)
+        raw_courses = self.get_courses(cache=False)
 
+        new_snapshot = {}
+        outdated_courses = []
+        for raw_course in raw_courses:
+            if not raw_course['isPublish']:
+                continue
+
+            course_id = str(raw_course['id'])
+            fingerprint = raw_course.get('updatedAt') or \
+                hashlib.sha1(json.dumps(raw_course, sort_keys=True).encode('utf-8')).hexdigest()
+
+            if course_id in old_snapshot and old_snapshot[course_id]['fingerprint'] == fingerprint:
+                new_snapshot[course_id] = old_snapshot[course_id]
+            else:
+                new_snapshot[course_id] = {'fingerprint': fingerprint}
+                outdated_courses += [raw_course]
+
+        # Only new or changed courses are downloaded
+        all_details = self._map(lambda course: self.get_course_details(course['id']), outdated_courses)
+        courses = [Course(course_details['id'],
+                          course_details['name'],
+                          [id['id'] for id in course_details['groups']])
+                   for course_details in all_details]
+        for course in courses:
+            for group_id in course.groups_id:
+                self.invalidate_cache(f'course-{course.id}-group-{group_id}')
+        self._get_course_structure(courses)
+
+        for course in courses:
+            new_snapshot[str(course.id)].update({
+                'name': course.name,
+                'groups_id': course.groups_id,
+                'lessons': [[lesson.lesson_type, lesson.name, lesson.lesson_id] for lesson in course.lessons]
+            })
+
+        synced_courses = []
+        for course_id, course_data in new_snapshot.items():
+            course = Course(int(course_id), course_data['name'], course_data['groups_id'])
+            course.lessons = [Lesson(*lesson) for lesson in course_data['lessons']]
+            synced_courses += [course]
+        self._set_courses(synced_courses)
+
+        delta = SyncDelta.compare(old_snapshot, new_snapshot)
+        self._save_snapshot(snapshot_file, new_snapshot)
+        logger.info(f'Sync is done. {len(outdated_courses)} courses downloaded, {len(delta.added)} lessons added, '
+                    f'{len(delta.removed)} removed, {len(delta.changed)} changed')
+
+        if save_data_to_file:
+            self.get_courses_data()
+            self.get_lessons_data()
+            delta.save(delta_file)
+
+        return delta
+
+    @staticmethod
+    def _load_snapshot(snapshot_file: str) -> dict:
+        """
+        :param snapshot_file: file where snapshot is kept
+        :return: snapshot data or empty dict if there is no snapshot yet
+        """
+        if not os.path.exists(snapshot_file):
+            return {}
+
+        with open(snapshot_file, encoding='utf-8') as file:
+            return json.load(file)
+
+    @staticmethod
+    def _save_snapshot(snapshot_file: str, snapshot: dict):
+        """
+        It saves snapshot to temporary file first and then replaces the old one, so it can't be left half-written
+
+        :param snapshot_file: file where snapshot is kept
+        :param snapshot: snapshot data
+        """
+        with open(snapshot_file + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(snapshot, file, ensure_ascii=False)
+
+        os.replace(snapshot_file + '.tmp', snapshot_file)
+
+
+class SyncDelta:
+    """
+    Difference between lessons of two syncs. Every lesson is a row like in lessons data: [id, name, type, course name]
+    """
+    def __init__(self, added: List[list], removed: List[list], changed: List[list]):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    @classmethod
+    def compare(cls, old_snapshot: dict, new_snapshot: dict) -> 'SyncDelta':
+        """
+        :param old_snapshot: snapshot of the last sync
+        :param new_snapshot: snapshot of the current sync
+        :return: SyncDelta instance
+        """
+        old_lessons = cls._get_lessons(old_snapshot)
+        new_lessons = cls._get_lessons(new_snapshot)
+
+        added = [row for key, row in new_lessons.items() if key not in old_lessons]
+        removed = [row for key, row in old_lessons.items() if key not in new_lessons]
+        changed = [row for key, row in new_lessons.items() if key in old_lessons and old_lessons[key] != row]
+
+        return cls(added, removed, changed)
+
+    @staticmethod
+    def _get_lessons(snapshot: dict) -> dict:
+        """
+        :param snapshot: snapshot data
+        :return: dict of lesson rows by (course id, lesson id)
+        """
+        lessons = {}
+        for course_id, course_data in snapshot.items():
+            for lesson_type, name, lesson_id in course_data.get('lessons', []):
+                lessons[(course_id, lesson_id)] = [lesson_id, name, lesson_type, course_data['name']]
+
+        return lessons
+
+    def save(self, file: str):
+        """
+        It saves the delta to csv file. Every row starts with a kind of change: 'added', 'removed' or 'changed'
+
+        :param file: filename where to save the delta
+        """
+        rows = [['change', 'id', 'name', 'type', 'course name']]
+        for change, lessons in (('added', self.added), ('removed', self.removed), ('changed', self.changed)):
+            rows += [[change] + lesson for lesson in lessons]
 
-class Student:
-    def __init__(self, first_name: str, last_name: str, contact_id: int, student_id: int, email: str, user_id: int):
-        self.first_name = first_name
-        self.last_name = last_name
-        self.contact_id = contact_id
-        self.email = email
-        self.student_id = student_id
-        self.user_id = user_id
+        CsvTools.csv_write_rows(file=file, rows=rows)
 
 
 if __name__ == '__main__':
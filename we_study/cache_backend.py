@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+That module provides cache backends which API class uses to keep responses of WE STUDY API. All of them can:
+    - Keep every entry for its own time (TTL)
+    - Limit amount of entries and drop least recently used ones
+    - Invalidate one entry or all of them
+    - Keep validators (ETag, Last-Modified, content hash) of entries to revalidate them when they expire
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class CacheBackend:
+    """
+    Base class of all cache backends. Values should be JSON-serializable
+    """
+    def get(self, key: str) -> Optional[Any]:
+        """
+        :param key: key of the entry
+        :return: cached value or None if there is no such entry or it has expired
+        """
+        raise NotImplementedError
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, dict]]:
+        """
+        It returns entry even if it has expired, so it can be revalidated
+
+        :param key: key of the entry
+        :return: tuple of cached value and its validators or None if there is no such entry
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float = None, validators: dict = None):
+        """
+        :param key: key of the entry
+        :param value: value to cache
+        :param ttl: how many seconds entry will be valid. If None, entry never expires
+        :param validators: data to revalidate entry with, like {'etag': ..., 'last_modified': ..., 'hash': ...}
+        """
+        raise NotImplementedError
+
+    def refresh(self, key: str, ttl: float = None):
+        """
+        It makes expired entry valid again for "ttl" seconds without rewriting its value
+
+        :param key: key of the entry
+        :param ttl: how many seconds entry will be valid. If None, entry never expires
+        """
+        raise NotImplementedError
+
+    def invalidate(self, key: str):
+        """
+        It removes one entry from cache
+
+        :param key: key of the entry
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        It removes all entries from cache
+        """
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """
+    Cache which keeps entries in memory. Values are returned as is (without copying), so they shouldn't be changed.
+    Expired entries are kept until they are dropped as least recently used ones
+    """
+    def __init__(self, max_entries: int = 256):
+        """
+        :param max_entries: how many entries can be kept. Least recently used entries are dropped first
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at, validators = entry
+            if expires_at is not None and expires_at < time.time():
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at, validators = entry
+            self._entries.move_to_end(key)
+            return value, validators
+
+    def set(self, key: str, value: Any, ttl: float = None, validators: dict = None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at, validators or {})
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def refresh(self, key: str, ttl: float = None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], expires_at, entry[2])
+                self._entries.move_to_end(key)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SqliteCache(CacheBackend):
+    """
+    Cache which keeps all entries in a single SQLite file. Every write is done in a transaction, so the file can't be
+    left half-written. Recently used entries are also kept in memory, so hot lookups don't touch the file at all
+    """
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path: str, max_entries: int = 10000, memory_entries: int = 256):
+        """
+        :param path: relative/absolute path to SQLite file. It will be created if it doesn't exist
+        :param max_entries: how many entries can be kept in the file. Least recently used entries are dropped first
+        :param memory_entries: how many entries can be kept in memory. If 0, every lookup reads the file
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._memory = MemoryCache(memory_entries) if memory_entries else None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        if self._memory:
+            value = self._memory.get(key)
+            if value is not None:
+                return value
+
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute('SELECT value, validators, expires_at FROM entries WHERE key = ?',
+                                     (key,)).fetchone()
+            if row is None:
+                return None
+
+            raw_value, raw_validators, expires_at = row
+            # expired entries are kept to be revalidated later
+            if expires_at is not None and expires_at < now:
+                return None
+
+            with connection:
+                connection.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+
+        value = json.loads(raw_value)
+        if self._memory:
+            self._memory.set(key, value, ttl=expires_at - now if expires_at is not None else None,
+                             validators=json.loads(raw_validators))
+
+        return value
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, dict]]:
+        if self._memory:
+            entry = self._memory.get_stale(key)
+            if entry is not None:
+                return entry
+
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute('SELECT value, validators FROM entries WHERE key = ?', (key,)).fetchone()
+
+        if row is None:
+            return None
+
+        raw_value, raw_validators = row
+        return json.loads(raw_value), json.loads(raw_validators)
+
+    def set(self, key: str, value: Any, ttl: float = None, validators: dict = None):
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        raw_value = json.dumps(value)
+        raw_validators = json.dumps(validators or {})
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO entries (key, value, validators, expires_at, accessed_at) '
+                                   'VALUES (?, ?, ?, ?, ?)', (key, raw_value, raw_validators, expires_at, now))
+                # drop least recently used entries over the limit
+                connection.execute('DELETE FROM entries WHERE key IN '
+                                   '(SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                                   (self.max_entries,))
+
+        if self._memory:
+            self._memory.set(key, value, ttl=ttl, validators=validators)
+
+    def refresh(self, key: str, ttl: float = None):
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+
+        if self._memory:
+            self._memory.refresh(key, ttl=ttl)
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('UPDATE entries SET expires_at = ?, accessed_at = ? WHERE key = ?',
+                                   (expires_at, now, key))
+
+    def invalidate(self, key: str):
+        if self._memory:
+            self._memory.invalidate(key)
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def clear(self):
+        if self._memory:
+            self._memory.clear()
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('DELETE FROM entries')
+
+    def close(self):
+        """
+        It closes connection to SQLite file
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        It opens SQLite file on first use and creates table for entries. If the file was created by other version
+        of that class, old entries are dropped
+
+        :return: sqlite3.Connection instance
+        """
+        if self._connection is not None:
+            return self._connection
+
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+        with connection:
+            if version != self.SCHEMA_VERSION:
+                connection.execute('DROP TABLE IF EXISTS entries')
+                connection.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+            connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                               'key TEXT PRIMARY KEY, '
+                               'value TEXT NOT NULL, '
+                               "validators TEXT NOT NULL DEFAULT '{}', "
+                               'expires_at REAL, '
+                               'accessed_at REAL NOT NULL)')
+
+        self._connection = connection
+        return connection
@@ -3,51 +3,374 @@
 That module provides functions to process generated students data
 """
 import os
+from array import array
 from pprint import pprint
+from typing import Dict, Iterable, Iterator, List
 
-from utils import (CsvTools, logger, script_place)
+from utils import (BufferedCsvWriter, CsvTools, logger, script_place)
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-def get_user_courses():
+
+# array module type codes of supported column types
+ARRAY_TYPECODES = {
+    'int64': 'q',
+    'int32': 'i',
+    'uint8': 'B',
+    'float64': 'd'
+}
+
+# Schema of generated students files. Percents and points are in 0-100 range, so they fit in one byte
+STUDENTS_SCHEMA = {
+    'id': 'int64',
+    'lesson_completion': 'uint8',
+    'webinar_completion': 'uint8',
+    'test_completion': 'uint8',
+    'average_points_for_tests': 'uint8'
+}
+
+
+class ColumnTable:
     """
-    It
+    Table which keeps every column as typed array: NumPy array if NumPy is installed, array.array otherwise.
+    Columns without type in schema are kept as lists of strings. Aggregations and joins are vectorized with NumPy
+    """
+    def __init__(self, columns: Dict[str, Iterable]):
+        """
+        :param columns: columns by field names. All of them should have the same length
+        """
+        self.columns = dict(columns)
+
+    @classmethod
+    def load_csv(cls, file: str, schema: Dict[str, str] = None, use_numpy: bool = None) -> 'ColumnTable':
+        """
+        It reads csv file row by row and puts values to typed columns
+
+        :param file: csv file with header row
+        :param schema: types of columns by field names, like {'id': 'int64'} (see ARRAY_TYPECODES). Default is None
+        :param use_numpy: if False, columns are kept as array.array even if NumPy is installed. Default is None
+        (NumPy is used if it's installed)
+        :return: ColumnTable instance
+        """
+        schema = schema or {}
+        rows = CsvTools.csv_iter_rows(file)
+        headers = next(rows, [])
+
+        for field, column_type in schema.items():
+            if column_type not in ARRAY_TYPECODES:
+                raise ValueError(f"Unknown type of {field}: {column_type}. Can be {', '.join(ARRAY_TYPECODES)}")
+
+        columns = [array(ARRAY_TYPECODES[schema[field]]) if field in schema else [] for field in headers]
+        converters = [float if schema.get(field) == 'float64' else int if field in schema else str
+                      for field in headers]
+
+        for row in rows:
+            for column, convert, value in zip(columns, converters, row):
+                column.append(convert(value))
+
+        if use_numpy is None:
+            use_numpy = np is not None
+
+        if use_numpy:
+            columns = [np.frombuffer(column, dtype=schema[field]) if field in schema else column
+                       for field, column in zip(headers, columns)]
+
+        return cls(zip(headers, columns))
+
+    @classmethod
+    def load_students(cls, file: str, use_numpy: bool = None) -> 'ColumnTable':
+        """
+        :param file: generated students file
+        :param use_numpy: see "load_csv"
+        :return: ColumnTable instance
+        """
+        return cls.load_csv(file, STUDENTS_SCHEMA, use_numpy=use_numpy)
+
+    @classmethod
+    def load_students_at_courses(cls, file: str = None, use_numpy: bool = None) -> 'ColumnTable':
+        """
+        :param file: students at courses file. Default is "data/students_at_courses.csv"
+        :param use_numpy: see "load_csv"
+        :return: ColumnTable instance where every course column is 0/1 flag
+        """
+        if file is None:
+            file = script_place(__file__) + 'data/students_at_courses.csv'
+
+        headers = next(CsvTools.csv_iter_rows(file), [])
+        schema = {field: 'int64' if field == 'id' else 'uint8' for field in headers}
+        return cls.load_csv(file, schema, use_numpy=use_numpy)
 
+    def __len__(self):
+        if not self.columns:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, field: str):
+        return self.columns[field]
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.columns)
+
+    def sum(self, field: str):
+        column = self.columns[field]
+        if np is not None and isinstance(column, np.ndarray):
+            return column.sum(dtype='int64' if column.dtype.kind in 'iu' else 'float64').item()
+        return sum(column)
+
+    def mean(self, field: str) -> float:
+        if not len(self):
+            return 0.0
+        return self.sum(field) / len(self)
+
+    def filter(self, mask) -> 'ColumnTable':
+        """
+        :param mask: sequence of bools, one for every row (e.g. table['test_completion'] > 50 with NumPy)
+        :return: ColumnTable instance with rows where mask is True
+        """
+        if np is not None and isinstance(mask, np.ndarray):
+            return ColumnTable({field: self._take(column, np.flatnonzero(mask))
+                                for field, column in self.columns.items()})
+
+        indexes = [index for index, flag in enumerate(mask) if flag]
+        return ColumnTable({field: self._take(column, indexes) for field, column in self.columns.items()})
+
+    def join(self, other: 'ColumnTable', on: str = 'id', suffix: str = '_other') -> 'ColumnTable':
+        """
+        Inner join of two tables by unique key field. Rows are ordered by key
+
+        :param other: ColumnTable instance
+        :param on: key field. Its values should be unique in both tables. Default is 'id'
+        :param suffix: it's added to fields of other table which are also in that table. Default is '_other'
+        :return: ColumnTable instance
+        """
+        keys, other_keys = self.columns[on], other.columns[on]
+
+        if np is not None and isinstance(keys, np.ndarray) and isinstance(other_keys, np.ndarray):
+            _, indexes, other_indexes = np.intersect1d(keys, other_keys, assume_unique=True, return_indices=True)
+        else:
+            other_positions = {key: position for position, key in enumerate(other_keys)}
+            pairs = sorted((key, position, other_positions[key])
+                           for position, key in enumerate(keys) if key in other_positions)
+            indexes = [position for _, position, _ in pairs]
+            other_indexes = [other_position for _, _, other_position in pairs]
+
+        columns = {field: self._take(column, indexes) for field, column in self.columns.items()}
+        for field, column in other.columns.items():
+            if field == on:
+                continue
+            columns[field + suffix if field in columns else field] = self._take(column, other_indexes)
+
+        return ColumnTable(columns)
+
+    @staticmethod
+    def _take(column, indexes):
+        """
+        :param column: NumPy array, array.array or list
+        :param indexes: positions of values to take
+        :return: column of the same kind with values at given positions
+        """
+        if np is not None and isinstance(column, np.ndarray):
+            return column[indexes]
+        if isinstance(column, array):
+            return array(column.typecode, [column[index] for index in indexes])
+        return [column[index] for index in indexes]
+
+
+class MembershipIndex:
     """
-    students = {}
-    courses = []
-    files = os.listdir(script_place(__file__) + 'generated_students/')
-    for file in files:
-        if not file.endswith('.csv'):
-            continue
+    Index of students at courses. Course names and student ids are interned to numbers. Courses of every student are
+    kept as one int bitset (bit N is set if the student is at course N) and students of every course are kept as
+    another one (bit N is set if student number N is at the course), so queries are done with bitwise operations
+    """
+    def __init__(self):
+        self.courses: List[str] = []
+        self._course_numbers: Dict[str, int] = {}
+        self._course_students: List[int] = []
+        self._counts: List[int] = []
+        self._students: Dict[int, int] = {}
+        self._student_ids: List[int] = []
+        self._student_numbers: Dict[int, int] = {}
+
+    @classmethod
+    def from_generated_students(cls, folder: str = None) -> 'MembershipIndex':
+        """
+        :param folder: folder with generated students files. Default is "generated_students"
+        :return: MembershipIndex instance with students of all courses. Courses are in order of files
+        """
+        if folder is None:
+            folder = script_place(__file__) + 'generated_students/'
 
-        students_of_course = CsvTools.csv_read_rows(script_place(__file__) + 'generated_students/' + file)[1:]
-        students_ids = sorted([id[0] for id in students_of_course])
-        course_name = ' '.join(file.split('_')[:-1])
+        index = cls()
+        for file in os.listdir(folder):
+            if not file.endswith('.csv'):
+                continue
 
-        if course_name not in courses:
-            courses += [course_name]
+            students_of_course = ColumnTable.load_csv(os.path.join(folder, file),
+                                                      schema={'id': STUDENTS_SCHEMA['id']})
+            course_name = ' '.join(file.split('_')[:-1])
+            index.add_students(students_of_course['id'].tolist(), course_name)
+
+        return index
+
+    def add_course(self, course_name: str) -> int:
+        """
+        :param course_name: name of the course
+        :return: number of the course. New courses get next number
+        """
+        number = self._course_numbers.get(course_name)
+        if number is None:
+            number = self._course_numbers[course_name] = len(self.courses)
+            self.courses += [course_name]
+            self._course_students += [0]
+            self._counts += [0]
+
+        return number
+
+    def add_students(self, students_ids: Iterable[int], course_name: str):
+        """
+        :param students_ids: ids of students at the course
+        :param course_name: name of the course
+        """
+        number = self.add_course(course_name)
+        bit = 1 << number
+        students = self._students
+        student_numbers = self._student_numbers
+        added_numbers = []
 
         for student_id in students_ids:
-            if student_id not in students:
-                students[student_id] = [course_name]
-            else:
-                students[student_id] += [course_name]
-
-    headers = ['id'] + courses
-    rows = [headers]
-
-    for student_id in students:
-        student_row = [int(student_id)]
-        for course in courses:
-            if course in students[student_id]:
-                student_row += [1]
-            else:
-                student_row += [0]
-
-        rows += [student_row]
-
-    CsvTools.csv_write_rows(script_place(__file__) + 'data/students_at_courses.csv',
-                            rows=CsvTools.sort_rows_by(field_name='id', rows=rows))
+            courses = students.get(student_id)
+            if courses is None:
+                courses = 0
+                student_numbers[student_id] = len(self._student_ids)
+                self._student_ids += [student_id]
+
+            if not courses & bit:
+                students[student_id] = courses | bit
+                added_numbers += [student_numbers[student_id]]
+
+        # bitset is built from bytes, because setting bits of big int one by one copies it every time
+        added_students = bytearray(len(self._student_ids) // 8 + 1)
+        for student_number in added_numbers:
+            added_students[student_number >> 3] |= 1 << (student_number & 7)
+
+        self._course_students[number] |= int.from_bytes(added_students, 'little')
+        self._counts[number] += len(added_numbers)
+
+    def courses_of(self, student_id: int) -> List[str]:
+        """
+        :param student_id: id of the student
+        :return: names of courses where the student is
+        """
+        courses = self._students.get(student_id, 0)
+        return [course for number, course in enumerate(self.courses) if courses >> number & 1]
+
+    def students_in_all(self, *course_names: str) -> List[int]:
+        """
+        :param course_names: names of courses
+        :return: sorted ids of students who are at all given courses
+        """
+        course_students = self._get_course_students(course_names)
+        if not course_students:
+            return sorted(self._students)
+
+        students = course_students[0]
+        for other_students in course_students[1:]:
+            students &= other_students
+
+        return self._get_student_ids(students)
+
+    def students_in_any(self, *course_names: str) -> List[int]:
+        """
+        :param course_names: names of courses
+        :return: sorted ids of students who are at least at one of given courses
+        """
+        students = 0
+        for other_students in self._get_course_students(course_names):
+            students |= other_students
+
+        return self._get_student_ids(students)
+
+    def enrolment_counts(self) -> Dict[str, int]:
+        """
+        :return: amount of students at every course
+        """
+        return dict(zip(self.courses, self._counts))
+
+    def iter_rows(self) -> Iterator[list]:
+        """
+        It yields rows of dense table: header row and then row of 0/1 flags for every student sorted by id
+
+        :return: iterator of rows
+        """
+        yield ['id'] + self.courses
+
+        courses_amount = len(self.courses)
+        for student_id in sorted(self._students):
+            # lowest bit is the first course, so binary string is reversed
+            flags = format(self._students[student_id], f'0{courses_amount}b')[::-1]
+            yield [student_id, *flags]
+
+    def save_csv(self, file: str, buffer_size: int = 1024 * 1024):
+        """
+        It writes dense table (see "iter_rows") to csv file row by row
+
+        :param file: relative/absolute path to csv file
+        :param buffer_size: size of file buffer in bytes. Default is 1 MB
+        """
+        with BufferedCsvWriter(file, buffer_size=buffer_size) as csv_writer:
+            csv_writer.writerows(self.iter_rows())
+
+        logger.info(f'{len(self)} students at {len(self.courses)} courses saved to {file}')
+
+    def _get_course_students(self, course_names: Iterable[str]) -> List[int]:
+        """
+        :param course_names: names of courses
+        :return: bitsets of students of given courses
+        """
+        course_students = []
+        for course_name in course_names:
+            if course_name not in self._course_numbers:
+                raise KeyError(f'There is no {course_name} course')
+            course_students += [self._course_students[self._course_numbers[course_name]]]
+
+        return course_students
+
+    def _get_student_ids(self, students: int) -> List[int]:
+        """
+        :param students: bitset of student numbers
+        :return: sorted ids of students
+        """
+        # lowest bit is the first student, so binary string is reversed. Zeros are skipped by "find"
+        bits = format(students, 'b')[::-1]
+        student_ids = []
+        position = bits.find('1')
+        while position != -1:
+            student_ids += [self._student_ids[position]]
+            position = bits.find('1', position + 1)
+
+        return sorted(student_ids)
+
+    def __len__(self):
+        return len(self._students)
+
+    def __contains__(self, student_id: int):
+        return student_id in self._students
+
+
+def get_user_courses() -> MembershipIndex:
+    """
+    It collects courses of all generated students and saves them to "data/students_at_courses.csv" as a table of
+    0/1 flags
+
+    :return: MembershipIndex instance
+    """
+    index = MembershipIndex.from_generated_students()
+    index.save_csv(script_place(__file__) + 'data/students_at_courses.csv')
+    return index
 
 
 if __name__ == '__main__':
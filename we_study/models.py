@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+That module provides classes of courses, lessons, students and groups which are shared by "api" and
+"student_generator" modules. All of them use __slots__, so millions of instances can be kept in memory.
+Student generator has its own smaller student class, because generated students have only id and courses
+"""
+import json
+import random as rd
+import sys
+from typing import Callable, List, Optional
+
+
+class Course:
+    __slots__ = ('id', 'name', 'groups_id', 'lessons_amount', 'tests_amount', 'webinars_amount',
+                 '_lessons', '_lessons_loader')
+
+    def __init__(self, course_id: int, name: str, groups_id: list = None, lessons_loader: Callable = None,
+                 lessons_amount: int = 0, tests_amount: int = 0, webinars_amount: int = 0):
+        """
+        :param course_id: id of the course
+        :param name: name of the course
+        :param groups_id: ids of course groups. Default is None (no groups)
+        :param lessons_loader: function which takes Course instance and returns its lessons. If provided, lessons
+        will be loaded on first access. Default is None
+        :param lessons_amount: amount of lessons (is used by student generator). Default is 0
+        :param tests_amount: amount of tests (is used by student generator). Default is 0
+        :param webinars_amount: amount of webinars (is used by student generator). Default is 0
+        """
+        self.id = course_id
+        self.name = name
+        self.groups_id: list = groups_id if groups_id is not None else []
+        self.lessons_amount = lessons_amount
+        self.tests_amount = tests_amount
+        self.webinars_amount = webinars_amount
+        self._lessons: Optional[List[Lesson]] = None if lessons_loader else []
+        self._lessons_loader = lessons_loader
+
+    @property
+    def lessons(self) -> List['Lesson']:
+        if self._lessons is None:
+            self._lessons = self._lessons_loader(self)
+
+        return self._lessons
+
+    @lessons.setter
+    def lessons(self, lessons: List['Lesson']):
+        self._lessons = lessons
+
+    @property
+    def lessons_loaded(self) -> bool:
+        return self._lessons is not None
+
+
+class Lesson:
+    __slots__ = ('lesson_type', 'name', 'lesson_id')
+
+    def __init__(self, lesson_type: str, name: str, lesson_id: int):
+        # there are only a few types of lessons, so all lessons share the same strings
+        self.lesson_type = sys.intern(lesson_type)
+        self.name = name
+        self.lesson_id = lesson_id
+
+
+class Student:
+    __slots__ = ('first_name', 'last_name', 'contact_id', 'student_id', 'email', 'user_id', 'statistics')
+
+    # fields which are exported for every student
+    fields = ['contact_id', 'user_id', 'first_name', 'last_name', 'email', 'statistics']
+
+    def __init__(self, first_name: str, last_name: str, contact_id: int, student_id: int, email: str, user_id: int,
+                 statistics=None):
+        self.first_name = first_name
+        self.last_name = last_name
+        self.contact_id = contact_id
+        self.email = email
+        self.student_id = student_id
+        self.user_id = user_id
+        self.statistics = statistics
+
+    @classmethod
+    def from_user(cls, contact_id: int, user: dict, statistics=None) -> 'Student':
+        """
+        :param contact_id: contact id of the student
+        :param user: response of "get_user"
+        :param statistics: response of "get_user_stat"
+        :return: Student instance
+        """
+        return cls(first_name=user.get('name'),
+                   last_name=user.get('secondName'),
+                   contact_id=contact_id,
+                   student_id=None,
+                   email=user.get('email'),
+                   user_id=user['id'],
+                   statistics=statistics)
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.fields}
+
+    def to_row(self) -> list:
+        """
+        :return: student data as csv row. Statistics are saved in JSON format
+        """
+        row = [getattr(self, field) for field in self.fields[:-1]]
+        return row + [json.dumps(self.statistics, ensure_ascii=False)]
+
+
+class Group:
+    __slots__ = ('type', 'group_size', 'points_range')
+
+    def __init__(self, group_type: str):
+        self.type = group_type
+        self.group_size = rd.randint(10, 25)
+        self.points_range = (0, 100)
+
+    def generate_points(self, last_score=None, rng=rd):
+        points = rng.randint(*self.points_range)
+        return points
+
+    def generate_points_array(self, rng, size: int, last_score=None):
+        """
+        Vectorized "generate_points": it generates points for "size" students at once
+
+        :param rng: numpy.random.Generator instance
+        :param size: amount of students
+        :param last_score: array of previous points of students. Default is None
+        :return: array of points
+        """
+        return rng.integers(*self.points_range, size=size, endpoint=True)
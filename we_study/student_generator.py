@@ -4,9 +4,15 @@ That module provides class and functions to generate students with defined param
 kind of groups of some courses
 """
 import random as rd
-from pprint import pprint
+from concurrent.futures import ProcessPoolExecutor
 
 from utils import (CsvTools, logger, script_place)
+from we_study.models import (Course, Group)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 default_headers = ['id', 'lesson_completion', 'webinar_completion', 'test_completion', 'average_points_for_tests']
 group_types = ['bad', 'good', 'excellent', 'mixed']
@@ -18,54 +24,91 @@ class StudentGenerator:
     Main class in that module that do all the stuff to generate students
     """
 
-    def __init__(self, students_amount: int, groups: list, courses_name_list: list):
+    def __init__(self, students_amount: int, groups: list, courses_name_list: list, seed=None):
+        """
+        :param students_amount: amount of students
+        :param groups: Group instances
+        :param courses_name_list: names of courses
+        :param seed: seed to get the same students every time. Default is None (random seed)
+        """
         self.students_amount = students_amount
         self.groups = groups
+        self.seed = seed if seed is not None else rd.randrange(2 ** 32)
         self._generated_lessons(courses_name_list)
         self._generate_students()
 
-    def main(self, headers=None):
+    def main(self, headers=None, max_workers: int = 1):
         """
-        It's the main function that generates all students and save them to CSV table
+        It's the main function that generates all students and save them to CSV table.
+        Every course is generated with its own random streams, so files are the same for the same seed no matter how
+        many workers are used
 
         :param headers: custom headers
+        :param max_workers: how many processes generate courses at the same time. Default is 1 (no processes)
         """
         if headers is None:
             headers = default_headers
 
-        for course in self.courses:
-            for group in self.groups:
-                course_group_rows = [headers]
-                group.group_size = rd.randint(10, 25)
-                group_size = group.group_size
+        if max_workers > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                courses_students = list(executor.map(self._generate_course, self.courses,
+                                                     [headers] * len(self.courses)))
+        else:
+            courses_students = [self._generate_course(course, headers) for course in self.courses]
+
+        for course, students_ids in zip(self.courses, courses_students):
+            for student_id in students_ids:
+                self.students[student_id].courses.add(course.name)
+
+    def _generate_course(self, course, headers: list) -> list:
+        """
+        It generates students of all groups of the course and save them to CSV tables
 
-                students = self._get_available_students(course.name, group_size)
+        :param course: Course instance
+        :param headers: headers of tables
+        :return: ids of students who are in groups of the course
+        """
+        # ids of students who are not in groups of the course yet
+        available_students = list(range(self.students_amount))
+        course_students = []
+
+        for group in self.groups:
+            course_group_rows = [headers]
+            rng = self._get_random(course.name, group.type)
+            group.group_size = rng.randint(10, 25)
+            group_size = group.group_size
+
+            students_ids = self._get_available_students(available_students, group_size, rng)
+            course_students += students_ids
 
-                for student in students:
-                    student_row = [student.student_id]
+            for student_id in students_ids:
+                student_row = [student_id]
 
-                    student_points = self._generate_student_points(group,
-                                                                   course.lessons,
-                                                                   course.webinars,
-                                                                   course.tests)
+                student_points = self._generate_student_points(group,
+                                                               course.lessons_amount,
+                                                               course.webinars_amount,
+                                                               course.tests_amount,
+                                                               rng)
 
-                    lesson_attendance_percent = student_points[0]
-                    webinar_attendance_percent = student_points[1]
-                    tests_attendance_percent = student_points[2]
-                    test_average_score = student_points[3]
+                lesson_attendance_percent = student_points[0]
+                webinar_attendance_percent = student_points[1]
+                tests_attendance_percent = student_points[2]
+                test_average_score = student_points[3]
 
-                    student_row = student_row + [lesson_attendance_percent,
-                                                 webinar_attendance_percent,
-                                                 tests_attendance_percent,
-                                                 test_average_score]
+                student_row = student_row + [lesson_attendance_percent,
+                                             webinar_attendance_percent,
+                                             tests_attendance_percent,
+                                             test_average_score]
 
-                    course_group_rows += [student_row]
+                course_group_rows += [student_row]
 
-                print(course.name, group.type)
-                pprint(course_group_rows)
-                self._write_rows(course_group_rows, course.name, group.type)
+            logger.info(f'{len(students_ids)} students generated for {course.name} ({group.type} group)')
+            self._write_rows(course_group_rows, course.name, group.type)
 
-    def _generate_student_points(self, group, lessons_amount: int, webinars_amount: int, tests_amount: int):
+        return course_students
+
+    def _generate_student_points(self, group, lessons_amount: int, webinars_amount: int, tests_amount: int,
+                                 rng=rd):
         """
         It generates points for lessons/webinars/tests of a student according to his group type
 
@@ -73,25 +116,26 @@ class StudentGenerator:
         :param lessons_amount: amount of lessons of a course
         :param webinars_amount: amount of webinars of a course
         :param tests_amount: amount of tests of a course
+        :param rng: random.Random instance. Default is "random" module
         :return: tuple of points for lessons/webinars/tests
         """
-        first_points = group.generate_points()
+        first_points = group.generate_points(rng=rng)
 
         lesson_attendance_percent = self._get_attendance(first_points, lessons_amount)
 
         webinar_attendance_percent = self._get_attendance(
-            group.generate_points(last_score=first_points),
+            group.generate_points(last_score=first_points, rng=rng),
             webinars_amount)
 
         tests_attendance_percent = self._get_attendance(
-            group.generate_points(last_score=first_points),
+            group.generate_points(last_score=first_points, rng=rng),
             tests_amount)
 
         # Checks if 0 tests was solved
         if tests_attendance_percent == 0:
             test_average_score = 0
         else:
-            test_average_score = group.generate_points(last_score=first_points)
+            test_average_score = group.generate_points(last_score=first_points, rng=rng)
 
         return (lesson_attendance_percent,
                 webinar_attendance_percent,
@@ -115,34 +159,45 @@ class StudentGenerator:
             CsvTools.sort_rows_by('id', rows)
         )
 
-    def _get_available_students(self, course_name: str, group_size: int) -> list:
+    @staticmethod
+    def _get_available_students(available_students: list, group_size: int, rng=rd) -> list:
         """
-        Get all students who are not in groups yet
+        Get random students who are not in groups of the course yet. They are removed from the pool of available
+        students of the course, so it costs only "group_size" steps
 
-        :param course_name: name of the concrete course
+        :param available_students: ids of students who are not in groups of the course yet
         :param group_size: in another words it is how many students should be retrieved
-        :return: list of Student instances of all available students
+        :param rng: random.Random instance. Default is "random" module
+        :return: list of ids of retrieved students
         """
-        available_students = []
-        students = rd.sample(self.students, k=len(self.students))
-        for student in students:
-            if course_name not in student.courses:
-                available_students += [student]
-                student.courses += [course_name]
+        students_ids = []
+        for _ in range(min(group_size, len(available_students))):
+            # take random student and put the last one to his place
+            index = rng.randrange(len(available_students))
+            available_students[index], available_students[-1] = available_students[-1], available_students[index]
+            students_ids += [available_students.pop()]
 
-            if len(available_students) == group_size:
-                break
+        return students_ids
 
-        return available_students
+    def _get_random(self, *names) -> rd.Random:
+        """
+        :param names: names of the stream like course name and group type
+        :return: random.Random instance which gives the same numbers for the same seed and names
+        """
+        return rd.Random(':'.join([str(self.seed), *names]))
 
     def _generate_students(self):
         """
         It generates Students instances to work with later
 
         """
-        self.students = []
-        for student_id in range(self.students_amount):
-            self.students += [Student(student_id)]
+        self.students = [Student(student_id) for student_id in range(self.students_amount)]
+
+    def __getstate__(self):
+        # workers don't need students, so they aren't sent to other processes
+        state = self.__dict__.copy()
+        state['students'] = None
+        return state
 
     def _generated_lessons(self, courses_name_lst):
         """
@@ -151,12 +206,14 @@ class StudentGenerator:
         :param courses_name_lst: name of course to generate lesson for
         """
         self.courses = []
-        for course_name in courses_name_lst:
+        for course_id, course_name in enumerate(courses_name_lst):
+            rng = self._get_random(course_name)
             self.courses += [Course(
+                course_id,
                 course_name,
-                rd.randint(4, 10),
-                rd.randint(2, 4),
-                rd.randint(3, 7)
+                lessons_amount=rng.randint(4, 10),
+                tests_amount=rng.randint(2, 4),
+                webinars_amount=rng.randint(3, 7)
             )]
 
     def _get_attendance(self, group_points: int, lessons_amount: int) -> int:
@@ -188,74 +245,190 @@ class StudentGenerator:
         return attendance_can_be.index(item)
 
 
-class Course:
-    def __init__(self, name: str, lessons: int, tests: int, webinars: int):
-        self.name = name
-        self.lessons = lessons
-        self.tests = tests
-        self.webinars = webinars
+class VectorizedStudentGenerator:
+    """
+    NumPy version of StudentGenerator for big data sets (millions of students). All points of a group are generated
+    at once with the same distributions as in StudentGenerator and written straight to CSV files
+    """
 
+    def __init__(self, students_amount: int, groups: list, courses_name_list: list, group_size_range=(10, 25),
+                 seed: int = None):
+        """
+        :param students_amount: amount of students
+        :param groups: Group instances
+        :param courses_name_list: names of courses
+        :param group_size_range: min and max size of a group. Default is (10, 25)
+        :param seed: seed of random generator. Default is None (random seed)
+        """
+        if np is None:
+            raise ImportError('numpy is required to use VectorizedStudentGenerator')
 
-class Student:
-    def __init__(self, student_id: int):
-        self.student_id = student_id
+        self.students_amount = students_amount
+        self.groups = groups
+        self.group_size_range = group_size_range
+        self.rng = np.random.default_rng(seed)
         self.courses = []
+        for course_id, course_name in enumerate(courses_name_list):
+            lessons_amount, tests_amount, webinars_amount = self.rng.integers([4, 2, 3], [10, 4, 7], endpoint=True)
+            self.courses += [Course(course_id, course_name, lessons_amount=int(lessons_amount),
+                                    tests_amount=int(tests_amount), webinars_amount=int(webinars_amount))]
 
+    def main(self, headers=None):
+        """
+        It generates all students and save them to CSV tables
 
-class Group:
-    def __init__(self, group_type: str):
-        self.type = group_type
-        self.group_size = rd.randint(10, 25)
-        self.points_range = (0, 100)
+        :param headers: custom headers
+        """
+        if headers is None:
+            headers = default_headers
 
-    def generate_points(self, last_score=None):
-        points = rd.randint(*self.points_range)
-        return points
+        for course in self.courses:
+            # every student can be only in one group of a course
+            students = self.rng.permutation(self.students_amount)
+            taken = 0
+
+            for group in self.groups:
+                group_size = int(self.rng.integers(*self.group_size_range, endpoint=True))
+                students_ids = np.sort(students[taken:taken + group_size])
+                taken += len(students_ids)
+
+                points = self._generate_students_points(group, len(students_ids),
+                                                        course.lessons_amount, course.webinars_amount,
+                                                        course.tests_amount)
+                table = np.column_stack([students_ids] + list(points))
+
+                logger.info(f'{len(students_ids)} students generated for {course.name} ({group.type} group)')
+                np.savetxt(
+                    script_place(__file__) + 'generated_students/' + '_'.join(course.name.split()) + '_' +
+                    group.type + '.csv',
+                    table, fmt='%d', delimiter=',', header=','.join(headers), comments='', encoding='utf-8'
+                )
+
+    def _generate_students_points(self, group, size: int, lessons_amount: int, webinars_amount: int,
+                                  tests_amount: int) -> tuple:
+        """
+        It generates points for lessons/webinars/tests of all students of a group (see
+        StudentGenerator._generate_student_points)
+
+        :return: tuple of arrays of points for lessons/webinars/tests
+        """
+        first_points = group.generate_points_array(self.rng, size)
+
+        lesson_attendance_percent = self._get_attendance(first_points, lessons_amount)
+        webinar_attendance_percent = self._get_attendance(
+            group.generate_points_array(self.rng, size, last_score=first_points),
+            webinars_amount)
+        tests_attendance_percent = self._get_attendance(
+            group.generate_points_array(self.rng, size, last_score=first_points),
+            tests_amount)
+
+        # Students who solved 0 tests have 0 average score
+        test_average_score = np.where(tests_attendance_percent == 0, 0,
+                                      group.generate_points_array(self.rng, size, last_score=first_points))
+
+        return (lesson_attendance_percent,
+                webinar_attendance_percent,
+                tests_attendance_percent,
+                test_average_score)
+
+    @staticmethod
+    def _get_attendance(group_points, lessons_amount: int):
+        """
+        It snaps every random percent to the nearest percent which can be got with "lessons_amount" lessons
+        (see StudentGenerator._get_attendance). Nearest one is either below or above the exact amount of lessons
+
+        :param group_points: array of random generated percents
+        :param lessons_amount: amount of all lessons/webinars/tests in the course
+        :return: array of percents of completed lessons/webinar/tests
+        """
+        lower = np.floor(group_points * lessons_amount / 100)
+        upper = np.minimum(lower + 1, lessons_amount)
+        lower_percent = np.round(lower / lessons_amount * 100)
+        upper_percent = np.round(upper / lessons_amount * 100)
+
+        # on a tie, lower percent is taken like in StudentGenerator
+        closer_upper = np.abs(upper_percent - group_points) < np.abs(lower_percent - group_points)
+        return np.where(closer_upper, upper_percent, lower_percent).astype('int64')
+
+
+class Student:
+    __slots__ = ('student_id', 'courses')
+
+    def __init__(self, student_id: int):
+        self.student_id = student_id
+        self.courses = set()
 
 
 class BadGroup(Group):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__('bad')
         self.points_range = (0, 50)
 
 
 class GoodGroup(Group):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__('good')
         self.points_range = (50, 85)
 
 
 class ExcellentGroup(Group):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__('excellent')
         self.points_range = (85, 100)
 
 
 class MixedGroup(Group):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__('mixed')
 
-    def generate_points(self, last_score=None):
+    def generate_points(self, last_score=None, rng=rd):
         worse_result = (0, 15)
         average_result = (15, 90)
         excellent_result = (90, 100)
 
         if last_score:
             # Get student's "intellect" and randomly create points for it
-            if last_score in list(range(*worse_result)):
-                points = rd.randint(*worse_result)
-            elif last_score in list(range(*average_result)):
-                points = rd.randint(*average_result)
+            if last_score in range(*worse_result):
+                points = rng.randint(*worse_result)
+            elif last_score in range(*average_result):
+                points = rng.randint(*average_result)
             else:
-                points = rd.randint(*excellent_result)
+                points = rng.randint(*excellent_result)
         else:
             # Randomly define student's "intellect"
-            points = rd.choice([rd.randint(*worse_result),
-                                rd.randint(*average_result),
-                                rd.randint(*excellent_result)])
+            points = rng.choice([rng.randint(*worse_result),
+                                 rng.randint(*average_result),
+                                 rng.randint(*excellent_result)])
 
         return points
 
+    def generate_points_array(self, rng, size: int, last_score=None):
+        worse_result = (0, 15)
+        average_result = (15, 90)
+        excellent_result = (90, 100)
+
+        results = np.stack([rng.integers(*worse_result, size=size, endpoint=True),
+                            rng.integers(*average_result, size=size, endpoint=True),
+                            rng.integers(*excellent_result, size=size, endpoint=True)])
+
+        # Randomly define student's "intellect"
+        result_type = rng.integers(0, 3, size=size)
+
+        if last_score is not None:
+            # Get student's "intellect" from previous points (0 points mean that it's not defined)
+            known_type = np.select([last_score < worse_result[1], last_score < average_result[1]], [0, 1], 2)
+            result_type = np.where(last_score == 0, result_type, known_type)
+
+        return results[result_type, np.arange(size)]
+
 
 if __name__ == '__main__':
     groups = [